@@ -6,6 +6,8 @@ This replaces the adk web UI with a REST API for user conversations.
 
 import asyncio
 import os
+import re
+import sys
 import uuid
 from contextlib import asynccontextmanager
 from typing import List, Optional
@@ -32,7 +34,7 @@ from host.agent import HostAgent
 from database import (
     get_db, get_or_create_user, create_session, get_session,
     add_message, can_user_send_message, get_user_message_count,
-    update_agent_state, get_agent_state, has_session_messages,
+    update_agent_state, get_agent_state, has_session_messages, get_session_message_counts,
     User, ConversationSession, ConversationMessage, FREE_USER_MESSAGE_LIMIT,
     get_stock_recommendation, get_user_stock_recommendations,
     can_user_generate_report, update_user_max_reports, add_user_credits,
@@ -128,6 +130,51 @@ host_agent_instance: Optional[HostAgent] = None
 # Global variable to store the MCP tool instance
 stock_mcp_tool: Optional[MCPToolset] = None
 
+# MCP server session, spawned on first use and reused across requests
+_stock_mcp_session = None
+_stock_mcp_session_lock = asyncio.Lock()
+
+
+async def get_stock_mcp_session():
+    """
+    Returns the pooled MCP server session, starting the server subprocess only on first use.
+
+    The cached session is pinged before reuse and recreated if the server process has exited,
+    so requests don't pay the process spawn and MCP handshake each time.
+
+    Returns:
+        An initialized MCP client session
+    """
+    global _stock_mcp_session
+    async with _stock_mcp_session_lock:
+        if _stock_mcp_session is not None:
+            try:
+                await _stock_mcp_session.send_ping()
+                return _stock_mcp_session
+            except Exception as e:
+                logger.warning(f"MCP session is no longer usable, reconnecting: {e}")
+                _stock_mcp_session = None
+
+        _stock_mcp_session = await stock_mcp_tool._mcp_session_manager.create_session()
+        logger.info("Started pooled MCP session")
+        return _stock_mcp_session
+
+
+# Number inside a stored amount string such as "$1250.00" or "16.6667 shares"
+_NUMBER_RE = re.compile(r'\d*\.?\d+')
+
+
+def _parse_number(value, default: float = 0.0) -> float:
+    """Returns the first number in value, or default if there is none; thousands separators are left in place."""
+    match = _NUMBER_RE.search(str(value))
+    return float(match.group()) if match else default
+
+
+def _total_investment(allocation_breakdown: List[dict]) -> float:
+    """Returns the sum of the investment amounts in a recommendation's allocation breakdown."""
+    return sum(_parse_number(stock.get("investment_amount", "$0")) for stock in allocation_breakdown)
+
+
 # Import configuration
 from config import current_config as Config
 
@@ -296,7 +343,7 @@ def get_current_user(authorization: str = Header(None)) -> dict:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager to initialize and cleanup the host agent."""
-    global host_agent_instance, stock_mcp_tool
+    global host_agent_instance, stock_mcp_tool, _stock_mcp_session
 
     try:
         logger.info("Initializing Host Agent...")
@@ -325,11 +372,18 @@ async def lifespan(app: FastAPI):
 
             server_script = os.path.join(mcp_directory, "server.py")
 
-            # Use uv run to execute in the correct virtual environment
+            # Launch the server with its virtualenv's interpreter directly when it exists, skipping
+            # uv's environment resolution on every spawn; fall back to uv run otherwise
+            venv_python = os.path.join(mcp_directory, ".venv", "Scripts" if sys.platform == "win32" else "bin", "python")
+            if os.path.exists(venv_python):
+                command, args = venv_python, [server_script]
+            else:
+                command, args = "uv", ["run", "--directory", mcp_directory, "python", server_script]
+            logger.info(f"MCP server command: {command}")
             connection_params = StdioConnectionParams(
                 server_params=StdioServerParameters(
-                    command="uv",
-                    args=["run", "--directory", mcp_directory, "python", server_script],
+                    command=command,
+                    args=args,
                     env=mcp_env,
                 )
             )
@@ -355,6 +409,7 @@ async def lifespan(app: FastAPI):
         # Cleanup if needed
         host_agent_instance = None
         stock_mcp_tool = None
+        _stock_mcp_session = None
 
 
 # Create FastAPI app with lifespan events
@@ -1329,12 +1384,11 @@ async def get_user_sessions(user_id: str):
             ConversationSession.user_id == user_id
         ).order_by(ConversationSession.updated_at.desc()).all()
         
+        # One grouped count for all sessions instead of a COUNT query per session
+        message_counts = get_session_message_counts(db, [session.id for session in sessions])
         session_list = []
         for session in sessions:
-            # Get message count for each session
-            message_count = db.query(ConversationMessage).filter(
-                ConversationMessage.session_id == session.id
-            ).count()
+            message_count = message_counts.get(session.id, 0)
             
             session_list.append({
                 "session_id": session.id,
@@ -1809,37 +1863,9 @@ async def get_portfolio_performance(session_id: str, _current_user: dict = Depen
                     )
 
                 try:
-                    # Fetch stock prices from MCP
+                    # Fetch stock prices from MCP, all tickers concurrently
                     tickers = [stock["ticker"] for stock in allocation_breakdown]
-                    entry_prices = {}
-
-                    for ticker in tickers:
-                        try:
-                            logger.info(f"Fetching stock info for {ticker} from MCP")
-                            session = await stock_mcp_tool._mcp_session_manager.create_session()
-                            stock_data = await session.call_tool("get_stock_info", arguments={"symbol": ticker})
-
-                            # Parse the stock data JSON
-                            stock_info = json.loads(str(stock_data))
-
-                            # Extract currentPrice from MCP data
-                            stock_type = stock_info.get("stock_type", "EQUITY")
-                            current_price = None
-
-                            if stock_type == "EQUITY":
-                                core_valuation = stock_info.get("core_valuation_metrics", {})
-                                current_price = core_valuation.get("currentPrice")
-                            else:  # ETF
-                                trading_valuation = stock_info.get("trading_valuation", {})
-                                current_price = trading_valuation.get("regularMarketPrice")
-
-                            if current_price:
-                                entry_prices[ticker] = float(current_price)
-                                logger.info(f"Fetched entry price for {ticker}: ${current_price}")
-
-                        except Exception as ticker_error:
-                            logger.error(f"Error fetching price for {ticker}: {ticker_error}")
-                            continue
+                    entry_prices = await fetch_current_prices_from_mcp(tickers)
 
                     if entry_prices:
                         # Update recommendation in database with entry prices
@@ -1886,13 +1912,13 @@ async def get_portfolio_performance(session_id: str, _current_user: dict = Depen
             if is_too_recent:
                 hours_old = time_since_recommendation.total_seconds() / 3600
                 stock_list = []
+                total_investment = 0.0
 
                 for stock in allocation_breakdown:
                     ticker = stock["ticker"]
-                    import re
                     investment_str = stock.get("investment_amount", "$0")
-                    investment_match = re.search(r'[\d.]+', investment_str)
-                    investment_amount = float(investment_match.group()) if investment_match else 0.0
+                    investment_amount = _parse_number(investment_str)
+                    total_investment += investment_amount
 
                     entry_price = entry_prices.get(ticker, 0.0)
 
@@ -1903,12 +1929,6 @@ async def get_portfolio_performance(session_id: str, _current_user: dict = Depen
                         "status": "too_recent"
                     })
 
-                total_investment = sum(
-                    float(re.search(r'[\d.]+', s.get("investment_amount", "$0")).group())
-                    for s in allocation_breakdown
-                    if re.search(r'[\d.]+', s.get("investment_amount", "$0"))
-                )
-
                 return {
                     "overall_performance": {
                         "total_investment": round(total_investment, 2),
@@ -1934,10 +1954,8 @@ async def get_portfolio_performance(session_id: str, _current_user: dict = Depen
                 ticker = stock["ticker"]
 
                 # Extract investment amount (remove $ and convert to float)
-                import re
                 investment_str = stock.get("investment_amount", "$0")
-                investment_match = re.search(r'[\d.]+', investment_str)
-                investment_amount = float(investment_match.group()) if investment_match else 0.0
+                investment_amount = _parse_number(investment_str)
 
                 total_investment += investment_amount
 
@@ -1950,8 +1968,7 @@ async def get_portfolio_performance(session_id: str, _current_user: dict = Depen
                     shares_str = stock.get("number_of_shares")
                     if shares_str:
                         # Parse the shares string (format: "16.6667 shares")
-                        shares_match = re.search(r'[\d.]+', shares_str)
-                        shares = float(shares_match.group()) if shares_match else 0.0
+                        shares = _parse_number(shares_str)
                         logger.info(f"Using pre-calculated shares for {ticker}: {shares}")
                     else:
                         # Fallback: Calculate number of shares (for backward compatibility)
@@ -2145,7 +2162,6 @@ async def get_latest_portfolio_performance(user_id: str, current_user: dict = De
             total_investment = 0.0
             total_current_value = 0.0
 
-            import re
             for stock in buy_stocks:
                 ticker = stock["ticker"]
 
@@ -2154,8 +2170,7 @@ async def get_latest_portfolio_performance(user_id: str, current_user: dict = De
                 if not entry_price:
                     # Try to extract from stock's entry_price field
                     entry_price_str = stock.get("entry_price", "$0")
-                    entry_match = re.search(r'[\d.]+', entry_price_str)
-                    entry_price = float(entry_match.group()) if entry_match else 0.0
+                    entry_price = _parse_number(entry_price_str)
 
                 # Get current price
                 current_price = current_prices.get(ticker, 0.0)
@@ -2163,19 +2178,16 @@ async def get_latest_portfolio_performance(user_id: str, current_user: dict = De
                 # Get number of shares - prefer pre-calculated value
                 shares_str = stock.get("number_of_shares")
                 if shares_str:
-                    shares_match = re.search(r'[\d.]+', shares_str)
-                    shares = float(shares_match.group()) if shares_match else 0.0
+                    shares = _parse_number(shares_str)
                 else:
                     # Fallback: calculate from investment amount
                     investment_str = stock.get("investment_amount", "$0")
-                    investment_match = re.search(r'[\d.]+', investment_str)
-                    investment_amount = float(investment_match.group()) if investment_match else 0.0
+                    investment_amount = _parse_number(investment_str)
                     shares = investment_amount / entry_price if entry_price > 0 else 0.0
 
                 # Get investment amount
                 investment_str = stock.get("investment_amount", "$0")
-                investment_match = re.search(r'[\d.]+', investment_str)
-                investment_amount = float(investment_match.group()) if investment_match else 0.0
+                investment_amount = _parse_number(investment_str)
 
                 if entry_price > 0 and current_price > 0 and shares > 0:
                     # Calculate values
@@ -2294,13 +2306,7 @@ async def get_user_recommendations(user_id: str, current_user: dict = Depends(ge
                 rec_data = rec.recommendation
                 allocation_breakdown = rec_data.get("allocation_breakdown", [])
 
-                # Calculate total investment
-                import re
-                total_investment = sum(
-                    float(re.search(r'[\d.]+', stock.get("investment_amount", "$0")).group())
-                    for stock in allocation_breakdown
-                    if re.search(r'[\d.]+', stock.get("investment_amount", "$0"))
-                )
+                total_investment = _total_investment(allocation_breakdown)
 
                 formatted_recommendations.append({
                     "session_id": rec.session_id,
@@ -2359,7 +2365,9 @@ async def fetch_current_stock_prices(tickers: list) -> dict:
         # Request current prices for all tickers
         ticker_list = ", ".join(tickers)
 
-        response = client.chat.completions.create(
+        # The OpenAI client is blocking, so run it in a worker thread to keep the event loop serving other requests
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model="sonar",
             messages=[
                 {
@@ -2396,10 +2404,61 @@ async def fetch_current_stock_prices(tickers: list) -> dict:
     return prices
 
 
+async def _fetch_price_from_mcp(session, ticker: str) -> Optional[float]:
+    """
+    Fetch the current price of one ticker over an MCP session.
+
+    Args:
+        session: MCP client session
+        ticker: Stock ticker symbol
+
+    Returns:
+        The current price, or None if it could not be fetched
+    """
+    try:
+        logger.info(f"Fetching current price for {ticker} from MCP")
+        stock_data_result = await session.call_tool("get_stock_info", arguments={"symbol": ticker})
+
+        # Parse MCP result object
+        stock_data = None
+        if hasattr(stock_data_result, 'content'):
+            if isinstance(stock_data_result.content, list) and len(stock_data_result.content) > 0:
+                content_item = stock_data_result.content[0]
+                if hasattr(content_item, 'text'):
+                    stock_data = json.loads(content_item.text)
+        elif isinstance(stock_data_result, dict):
+            stock_data = stock_data_result
+        elif isinstance(stock_data_result, str):
+            stock_data = json.loads(stock_data_result)
+
+        if stock_data:
+            stock_type = stock_data.get("stock_type", "EQUITY")
+            current_price = None
+
+            if stock_type == "EQUITY":
+                core_valuation = stock_data.get("core_valuation_metrics", {})
+                current_price = core_valuation.get("currentPrice")
+            else:  # ETF
+                trading_valuation = stock_data.get("trading_valuation", {})
+                current_price = trading_valuation.get("regularMarketPrice")
+
+            if current_price:
+                logger.info(f"Fetched current price for {ticker}: ${current_price}")
+                return float(current_price)
+            logger.warning(f"No price found for {ticker}")
+
+    except Exception as ticker_error:
+        logger.error(f"Error fetching price for {ticker}: {ticker_error}")
+    return None
+
+
 async def fetch_current_prices_from_mcp(tickers: list) -> dict:
     """
     Fetch current stock prices using MCP tool.
 
+    All tickers are requested concurrently over the pooled session, so the total
+    latency is that of the slowest ticker rather than the sum of all of them.
+
     Args:
         tickers: List of stock ticker symbols
 
@@ -2413,44 +2472,9 @@ async def fetch_current_prices_from_mcp(tickers: list) -> dict:
         return prices
 
     try:
-        for ticker in tickers:
-            try:
-                logger.info(f"Fetching current price for {ticker} from MCP")
-                session = await stock_mcp_tool._mcp_session_manager.create_session()
-                stock_data_result = await session.call_tool("get_stock_info", arguments={"symbol": ticker})
-
-                # Parse MCP result object
-                stock_data = None
-                if hasattr(stock_data_result, 'content'):
-                    if isinstance(stock_data_result.content, list) and len(stock_data_result.content) > 0:
-                        content_item = stock_data_result.content[0]
-                        if hasattr(content_item, 'text'):
-                            stock_data = json.loads(content_item.text)
-                elif isinstance(stock_data_result, dict):
-                    stock_data = stock_data_result
-                elif isinstance(stock_data_result, str):
-                    stock_data = json.loads(stock_data_result)
-
-                if stock_data:
-                    stock_type = stock_data.get("stock_type", "EQUITY")
-                    current_price = None
-
-                    if stock_type == "EQUITY":
-                        core_valuation = stock_data.get("core_valuation_metrics", {})
-                        current_price = core_valuation.get("currentPrice")
-                    else:  # ETF
-                        trading_valuation = stock_data.get("trading_valuation", {})
-                        current_price = trading_valuation.get("regularMarketPrice")
-
-                    if current_price:
-                        prices[ticker] = float(current_price)
-                        logger.info(f"Fetched current price for {ticker}: ${current_price}")
-                    else:
-                        logger.warning(f"No price found for {ticker}")
-
-            except Exception as ticker_error:
-                logger.error(f"Error fetching price for {ticker}: {ticker_error}")
-                continue
+        session = await get_stock_mcp_session()
+        results = await asyncio.gather(*(_fetch_price_from_mcp(session, ticker) for ticker in tickers))
+        prices = {ticker: price for ticker, price in zip(tickers, results) if price is not None}
 
     except Exception as e:
         logger.error(f"Error in fetch_current_prices_from_mcp: {e}")
@@ -2588,16 +2612,13 @@ async def get_user_portfolio_performance(user_id: str, _current_user: dict = Dep
                 recommendation = stock.get("recommendation", "HOLD")
 
                 # Extract investment amount
-                import re
                 investment_str = stock.get("investment_amount", "$0")
-                investment_match = re.search(r'[\d.]+', investment_str.replace(",", ""))
-                investment_amount = float(investment_match.group()) if investment_match else 0.0
+                investment_amount = _parse_number(investment_str.replace(",", ""))
 
                 # Get entry price from the stock recommendation (we just added this field!)
                 entry_price_str = stock.get("entry_price", "")
                 if entry_price_str:
-                    entry_price_match = re.search(r'[\d.]+', str(entry_price_str).replace(",", ""))
-                    entry_price = float(entry_price_match.group()) if entry_price_match else entry_prices_dict.get(ticker, 0.0)
+                    entry_price = _parse_number(str(entry_price_str).replace(",", ""), entry_prices_dict.get(ticker, 0.0))
                 else:
                     # Fallback to entry_prices dict
                     entry_price = entry_prices_dict.get(ticker, 0.0)
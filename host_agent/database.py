@@ -5,8 +5,8 @@ Handles session management, user tracking, and conversation state.
 
 import os
 from datetime import datetime
-from typing import Optional
-from sqlalchemy import create_engine, Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON
+from typing import Dict, List, Optional
+from sqlalchemy import func, create_engine, Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
@@ -345,6 +345,20 @@ def has_session_messages(db: Session, session_id: str) -> bool:
         return False
 
 
+def get_session_message_counts(db: Session, session_ids: List[str]) -> Dict[str, int]:
+    """Get message counts for several sessions with one grouped query; sessions without messages are omitted."""
+    if not session_ids:
+        return {}
+    try:
+        rows = db.query(ConversationMessage.session_id, func.count(ConversationMessage.id)).filter(
+            ConversationMessage.session_id.in_(session_ids)
+        ).group_by(ConversationMessage.session_id).all()
+        return {session_id: count for session_id, count in rows}
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting message counts for {len(session_ids)} sessions: {e}")
+        return {}
+
+
 def get_user_message_count(db: Session, user_id: str) -> int:
     """Get the total number of user messages for a user."""
     try:
@@ -1,12 +1,16 @@
 import asyncio
+import io
 import json
+import mmap
 import uuid
 import os
+import sys
 import time
 import threading
 import shutil
 from datetime import datetime
-from typing import Any, AsyncIterable, List, Tuple
+from functools import lru_cache
+from typing import Any, AsyncIterable, Dict, List, Optional, Tuple
 
 import boto3
 import httpx
@@ -30,8 +34,9 @@ from google.adk.sessions import InMemorySessionService
 from google.adk.tools import FunctionTool
 from google.genai import types
 from .remote_agent_connection import RemoteAgentConnections
-from .document_analyzer import read_portfolio_document, extract_stock_tickers_from_text, verify_portfolio_document, verify_text_portfolio
+from .document_analyzer import read_portfolio_document, extract_stock_tickers_from_text, verify_portfolio_document, verify_text_portfolio, get_genai_client
 import logging
+import orjson
 
 # Import database functions and models at the top
 try:
@@ -51,6 +56,142 @@ nest_asyncio.apply()
 logger = logging.getLogger("host_agent_api.host_agent")
 logger.setLevel(logging.INFO)
 
+# Static category data shipped next to this module; resolved once at import
+_STOCK_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stock_data.json")
+
+# A file's mtime is re-checked at most this often, so hot tool calls skip the stat syscall
+_MTIME_RECHECK_SECONDS = 5.0
+_mtime_checks: Dict[str, Tuple[float, int]] = {}
+
+
+def _get_mtime_ns(path: str) -> int:
+    """
+    Returns the file's st_mtime_ns, re-stat'ing it only once the recheck interval has passed.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        The file's modification time in nanoseconds
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+    """
+    now = time.monotonic()
+    checked = _mtime_checks.get(path)
+    if checked is not None and now - checked[0] < _MTIME_RECHECK_SECONDS:
+        return checked[1]
+    mtime_ns = os.stat(path).st_mtime_ns
+    _mtime_checks[path] = (now, mtime_ns)
+    return mtime_ns
+
+
+@lru_cache(maxsize=8)
+def _parse_json_file(path: str, mtime_ns: int) -> Any:
+    """
+    Parses a JSON file; memoized on (path, mtime_ns) so a file is re-parsed only after it changes.
+
+    Args:
+        path: Path to the JSON file
+        mtime_ns: The file's modification time, used as part of the cache key
+
+    Returns:
+        The parsed JSON content
+    """
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch either the same way
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # An empty file can't be mapped; orjson still reports it as a JSONDecodeError
+            return orjson.loads(f.read())
+        # Parse straight from the page cache through a read-only mapping instead of copying into a bytes buffer
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
+
+
+def _append_unique_tickers(tickers: List[str], stocks: List[str]) -> List[str]:
+    """
+    Appends normalized tickers that aren't already present, keeping the list's order.
+
+    Args:
+        tickers: The stored ticker list, modified in place
+        stocks: Tickers or names to add
+
+    Returns:
+        The tickers that were actually added
+    """
+    # Normalize and dedupe the input first (order-preserving), then one set lookup per ticker.
+    # Tickers are interned so repeated symbols share one string object across lists and sessions
+    incoming = dict.fromkeys(sys.intern(stock.upper().strip()) for stock in stocks if stock.strip())
+    present = set(tickers)
+    added = [ticker for ticker in incoming if ticker not in present]
+    tickers.extend(added)
+    return added
+
+
+# Static troubleshooting text returned by get_agent_status when no remote agents are connected
+_NO_AGENTS_STATUS = (
+    "**Connected Agents Status:**\n\n"
+    "❌ **No agents connected.**\n\n"
+    "**Troubleshooting Steps:**\n"
+    "1. **Check if agents are running:**\n"
+    "   - Stock Analyser Agent should be running on port 10002\n"
+    "   - Stock Report Analyser Agent should be running on port 10003\n"
+    "2. **Start the agents:**\n"
+    "   - Navigate to stockanalyser_agent directory and run: `python -m __main__`\n"
+    "   - Navigate to stockreport_analyser_agent directory and run: `python -m __main__`\n"
+    "3. **Check ports:** Ensure ports 10002 and 10003 are not being used by other applications\n"
+    "4. **Restart host agent:** After starting the agents, restart this host agent\n\n"
+    "**Expected URLs:**\n"
+    "- http://localhost:10002 (Stock Analyser Agent)\n"
+    "- http://localhost:10003 (Stock Report Analyser Agent)\n"
+)
+
+# Per-ticker line of the delegation request's share count section; the stock analyser parses this layout
+_SHARE_COUNT_LINE_TEMPLATE = "- {ticker}: {shares} shares\n"
+
+# Category prefix in stock_data.json for each market preference
+_MARKET_CATEGORY_PREFIXES = {"US": "USA_", "INDIA": "INDIA_"}
+
+# Date format shown to the model in the root instruction
+_INSTRUCTION_DATE_FORMAT = "%Y-%m-%d"
+
+def _get_category_index() -> Tuple[Dict[str, Tuple[int, str]], Dict[str, str]]:
+    """
+    Returns the rendered category listings and per-market category names for stock_data.json.
+
+    Every category is rendered once per file version, so lookups are a dict access.
+
+    Returns:
+        Tuple of (category -> (stock count, rendered listing), market preference -> available category names)
+
+    Raises:
+        FileNotFoundError: If stock_data.json does not exist
+        json.JSONDecodeError: If stock_data.json is not valid JSON
+    """
+    return _render_category_index(_get_mtime_ns(_STOCK_DATA_PATH))
+
+
+@lru_cache(maxsize=1)
+def _render_category_index(mtime_ns: int) -> Tuple[Dict[str, Tuple[int, str]], Dict[str, str]]:
+    """Renders the category index for the given stock_data.json version; a new mtime misses the cache and rebuilds it."""
+    stock_data = _parse_json_file(_STOCK_DATA_PATH, mtime_ns)
+    listings = {}
+    for category, stocks in stock_data.items():
+        listings[category] = (len(stocks), "".join([
+            f"**Top stocks for category '{category}':**\n\n",
+            f"**Number of stocks:** {len(stocks)}\n\n",
+            "**Stock tickers:**\n",
+            *(f"{i}. {stock}\n" for i, stock in enumerate(stocks, 1)),
+            "\n**Analysis:**\n",
+            f"These {len(stocks)} stocks represent the top performers in this category and can be considered for portfolio allocation.\n",
+            "You can add selected stocks to your analysis using the `add_new_stocks` tool.",
+        ]))
+    market_categories = {
+        market: "\n".join(cat for cat in stock_data if cat.startswith(prefix))
+        for market, prefix in _MARKET_CATEGORY_PREFIXES.items()
+    }
+    return listings, market_categories
+
 
 class HostAgent:
     """The Host agent."""
@@ -61,6 +202,8 @@ class HostAgent:
         self.remote_agent_connections: dict[str, RemoteAgentConnections] = {}
         self.cards: dict[str, AgentCard] = {}
         self.agents: str = ""
+        # ((date, agents), rendered instruction) for the last root_instruction call
+        self._root_instruction_cache: Optional[Tuple[Tuple[str, str], str]] = None
         # Keep only session tracking in memory - all other state goes to database
         self.current_session_id = {"id": "", "user_id": "", "is_file_uploaded": False}  # Store current session info
         self._agent = self.create_agent()
@@ -217,6 +360,25 @@ class HostAgent:
             import traceback
             logger.error(f"   Traceback: {traceback.format_exc()}")
 
+    def _set_state_value(self, state: dict, key: str, value: Any) -> bool:
+        """
+        Sets a state field and saves the state, skipping the database write when the value is unchanged.
+
+        Args:
+            state: The loaded session state, updated in place
+            key: State field to set
+            value: New value for the field
+
+        Returns:
+            True if the value changed and was saved, False if it was already set
+        """
+        if key in state and state[key] == value:
+            logger.info(f"State field '{key}' unchanged, skipping save")
+            return False
+        state[key] = value
+        self._save_state(state)
+        return True
+
     def create_agent(self) -> Agent:
         max_retries = 5  # Increased retries for API reliability
         base_delay = 2   # Base delay in seconds
@@ -276,7 +438,13 @@ class HostAgent:
     def root_instruction(self, context: ReadonlyContext) -> str:
         # Access context to satisfy linter requirement
         _ = context
-        return f"""
+        # ADK asks for the instruction on every model turn, but it only changes with the date or connected agents
+        today = datetime.now().strftime(_INSTRUCTION_DATE_FORMAT)
+        cache_key = (today, self.agents)
+        if self._root_instruction_cache is not None and self._root_instruction_cache[0] == cache_key:
+            return self._root_instruction_cache[1]
+
+        instruction = f"""
         **SCOPE RESTRICTION - READ THIS FIRST:**
         You are a specialized portfolio analyzer and stock recommender bot. You can ONLY answer questions related to:
         - Stock portfolio analysis and management
@@ -471,12 +639,14 @@ class HostAgent:
         * Check what information is already stored before asking questions
         * The stock analysis happens in the background after you call `store_receiver_email_id`
 
-        **Today's Date (YYYY-MM-DD):** {datetime.now().strftime("%Y-%m-%d")}
+        **Today's Date (YYYY-MM-DD):** {today}
 
         <Available Agents>
         {self.agents}
         </Available Agents>
         """
+        self._root_instruction_cache = (cache_key, instruction)
+        return instruction
 
     async def stream(
         self, query: str, session_id: str, user_id: str = ""
@@ -671,12 +841,12 @@ class HostAgent:
                 if isinstance(part, dict):
                     if part.get("type") == "text":
                         logger.info(f"Response part {i+1} (text): {len(part.get('text', ''))} characters")
-                        logger.debug(f"Response part {i+1} preview: {part.get('text', '')[:200]}...")
+                        logger.debug("Response part %d preview: %.200s...", i + 1, part.get('text', ''))
                     else:
                         logger.info(f"Response part {i+1} (type: {part.get('type', 'unknown')})")
                 elif isinstance(part, str):
                     logger.info(f"Response part {i+1} (string): {len(part)} characters")
-                    logger.debug(f"Response part {i+1} preview: {part[:200]}...")
+                    logger.debug("Response part %d preview: %.200s...", i + 1, part)
             
             # Automatically store response from stock report analyser agent
             if agent_name.lower() == "stock_report_analyser_agent" and resp:
@@ -927,8 +1097,7 @@ class HostAgent:
     def store_stock_report_response(self, response: str):
         """Stores the response received from the stock report analyser agent."""
         state = self._load_state()
-        state["stock_report_response"] = response
-        self._save_state(state)
+        self._set_state_value(state, "stock_report_response", response)
         logger.info(f"Stored stock report response: {len(response)} characters")
         return f"Stock report response stored successfully. Response length: {len(response)} characters"
 
@@ -936,8 +1105,7 @@ class HostAgent:
         """Stores the investment amount for stock analysis."""
         logger.info(f"🔧 TOOL CALLED: store_investment_amount(amount={amount})")
         state = self._load_state()
-        state["investment_amount"] = amount
-        self._save_state(state)
+        self._set_state_value(state, "investment_amount", amount)
         logger.info(f"✓ Stored investment amount: ${amount:,.2f}")
         return f"Investment amount stored successfully: ${amount:,.2f}"
 
@@ -962,8 +1130,7 @@ class HostAgent:
 
         # Store in agent state
         state = self._load_state()
-        state["market_preference"] = market_normalized
-        self._save_state(state)
+        self._set_state_value(state, "market_preference", market_normalized)
 
         # Also update the database session
         try:
@@ -1025,8 +1192,7 @@ class HostAgent:
         logger.info(f"🔧 TOOL CALLED: store_diversification_preference(preference='{preference[:100]}...')")
         # Store the FULL preference text, not a simplified version
         state = self._load_state()
-        state["diversification_preference"] = preference.strip()
-        self._save_state(state)
+        self._set_state_value(state, "diversification_preference", preference.strip())
         logger.info(f"✓ User's investment strategy stored: {state['diversification_preference'][:100]}...")
         return f"Investment strategy stored successfully: {preference[:100]}..."
 
@@ -1037,8 +1203,7 @@ class HostAgent:
 
         # Load state and update email
         state = self._load_state()
-        state["receiver_email_id"] = email_id
-        self._save_state(state)
+        self._set_state_value(state, "receiver_email_id", email_id)
         logger.info(f"Stored receiver email ID: {email_id}")
 
         # Check if all prerequisites are met for ending the session
@@ -1128,41 +1293,29 @@ class HostAgent:
         """Adds existing portfolio stocks to the list."""
         logger.info(f"🔧 TOOL CALLED: add_existing_stocks(stocks={stocks})")
         state = self._load_state()
-        for stock in stocks:
-            stock_upper = stock.upper().strip()
-            if stock_upper not in state["existing_portfolio_stocks"]:
-                state["existing_portfolio_stocks"].append(stock_upper)
-        self._save_state(state)
+        # Only write the state back when a ticker was actually added
+        if _append_unique_tickers(state["existing_portfolio_stocks"], stocks):
+            self._save_state(state)
         logger.info(f"✓ Added {len(stocks)} existing stocks. Total: {len(state['existing_portfolio_stocks'])}")
         return f"Added {len(stocks)} existing portfolio stocks. Current list: {', '.join(state['existing_portfolio_stocks'])}"
 
     def add_new_stocks(self, stocks: List[str]):
         """Adds new stocks to the list, converting stock names to tickers using LLM."""
         logger.info(f"🔧 TOOL CALLED: add_new_stocks(stocks={stocks})")
-        from google import genai
         from google.genai.types import GenerateContentConfig
 
         state = self._load_state()
         logger.info(f"Using LLM to find stock tickers for: {stocks}")
 
-        # Create the client with proper configuration
-        if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-            client = genai.Client(vertexai=True)
-            logger.info("Using Vertex AI for ticker lookup")
-        else:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                logger.error("No GOOGLE_API_KEY found for ticker lookup")
-                # Fallback to original behavior
-                for stock in stocks:
-                    stock_upper = stock.upper().strip()
-                    if stock_upper not in state["new_stocks"]:
-                        state["new_stocks"].append(stock_upper)
-                self._save_state(state)
-                logger.info(f"Added {len(stocks)} new stocks (fallback mode). Total: {len(state['new_stocks'])}")
-                return f"Added {len(stocks)} new stocks (API key missing). Current list: {', '.join(state['new_stocks'])}"
-            client = genai.Client(api_key=api_key)
-            logger.info("Using Google AI API for ticker lookup")
+        # Reuse the process-wide Gemini client
+        client = get_genai_client()
+        if client is None:
+            logger.error("No GOOGLE_API_KEY found for ticker lookup")
+            # Fallback to original behavior
+            _append_unique_tickers(state["new_stocks"], stocks)
+            self._save_state(state)
+            logger.info(f"Added {len(stocks)} new stocks (fallback mode). Total: {len(state['new_stocks'])}")
+            return f"Added {len(stocks)} new stocks (API key missing). Current list: {', '.join(state['new_stocks'])}"
 
         # System prompt for ticker lookup
         system_prompt = """You are a financial data expert. Your job is to convert stock names or company names to their correct stock ticker symbols.
@@ -1249,24 +1402,17 @@ Return ONLY a JSON array of uppercase ticker symbols. If a name is already a tic
                 logger.warning("Market preference not set - skipping stock validation")
 
             # Add tickers to the list
-            added_count = 0
-            for ticker in tickers:
-                ticker_upper = ticker.upper().strip()
-                if ticker_upper not in state["new_stocks"]:
-                    state["new_stocks"].append(ticker_upper)
-                    added_count += 1
+            added_count = len(_append_unique_tickers(state["new_stocks"], tickers))
 
-            self._save_state(state)
+            if added_count:
+                self._save_state(state)
             logger.info(f"Added {added_count} new stocks. Total: {len(state['new_stocks'])}")
             return f"Added {added_count} new stocks (tickers: {', '.join(tickers)}). Current list: {', '.join(state['new_stocks'])}"
 
         except Exception as e:
             logger.error(f"Error in LLM ticker lookup: {e}")
             # Fallback to original behavior if LLM call fails
-            for stock in stocks:
-                stock_upper = stock.upper().strip()
-                if stock_upper not in state["new_stocks"]:
-                    state["new_stocks"].append(stock_upper)
+            _append_unique_tickers(state["new_stocks"], stocks)
             self._save_state(state)
             logger.info(f"Added {len(stocks)} new stocks (fallback mode). Total: {len(state['new_stocks'])}")
             return f"Added {len(stocks)} new stocks (using input as-is due to error: {str(e)}). Current list: {', '.join(state['new_stocks'])}"
@@ -1290,11 +1436,11 @@ Return ONLY a JSON array of uppercase ticker symbols. If a name is already a tic
         if "share_counts" not in state:
             state["share_counts"] = {}
 
-        # Store the share count
-        ticker_upper = ticker.upper().strip()
-        state["share_counts"][ticker_upper] = float(shares)
-
-        self._save_state(state)
+        # Store the share count, skipping the write if it is already recorded
+        ticker_upper = sys.intern(ticker.upper().strip())
+        if state["share_counts"].get(ticker_upper) != float(shares):
+            state["share_counts"][ticker_upper] = float(shares)
+            self._save_state(state)
         logger.info(f"✓ Stored {shares} shares for {ticker_upper}")
 
         return f"Stored {shares} shares for {ticker_upper}. This will be used for portfolio analysis and SELL recommendations."
@@ -1312,53 +1458,53 @@ Return ONLY a JSON array of uppercase ticker symbols. If a name is already a tic
         if not share_counts:
             return "No share counts have been stored yet."
 
-        result = "**Stored Share Counts:**\n\n"
+        parts = ["**Stored Share Counts:**\n\n"]
         for ticker, shares in share_counts.items():
-            result += f"• {ticker}: {shares} shares\n"
+            parts.append(f"• {ticker}: {shares} shares\n")
 
-        return result
+        return "".join(parts)
 
     def get_stock_lists(self):
         """Returns the current stock lists, investment amount, and report response."""
         state = self._load_state()
-        result = "**Current Investment Information:**\n\n"
+        parts = ["**Current Investment Information:**\n\n"]
 
         # Add investment amount
-        result += f"**Investment Amount:**\n"
+        parts.append("**Investment Amount:**\n")
         if state["investment_amount"] > 0:
-            result += f"${state['investment_amount']:,.2f}\n\n"
+            parts.append(f"${state['investment_amount']:,.2f}\n\n")
         else:
-            result += "Not set yet.\n\n"
+            parts.append("Not set yet.\n\n")
 
         # Add receiver email ID
-        result += f"**Receiver Email ID:**\n"
+        parts.append("**Receiver Email ID:**\n")
         if state["receiver_email_id"]:
-            result += f"{state['receiver_email_id']}\n\n"
+            parts.append(f"{state['receiver_email_id']}\n\n")
         else:
-            result += "Not set yet.\n\n"
+            parts.append("Not set yet.\n\n")
 
-        result += f"**Existing Portfolio Stocks ({len(state['existing_portfolio_stocks'])}):**\n"
+        parts.append(f"**Existing Portfolio Stocks ({len(state['existing_portfolio_stocks'])}):**\n")
         if state["existing_portfolio_stocks"]:
             for i, stock in enumerate(state["existing_portfolio_stocks"], 1):
-                result += f"{i}. {stock}\n"
+                parts.append(f"{i}. {stock}\n")
         else:
-            result += "No existing portfolio stocks added yet.\n"
+            parts.append("No existing portfolio stocks added yet.\n")
 
-        result += f"\n**New Stocks ({len(state['new_stocks'])}):**\n"
+        parts.append(f"\n**New Stocks ({len(state['new_stocks'])}):**\n")
         if state["new_stocks"]:
             for i, stock in enumerate(state["new_stocks"], 1):
-                result += f"{i}. {stock}\n"
+                parts.append(f"{i}. {stock}\n")
         else:
-            result += "No new stocks added yet.\n"
+            parts.append("No new stocks added yet.\n")
 
-        result += f"\n**Stock Report Response:**\n"
+        parts.append("\n**Stock Report Response:**\n")
         if state["stock_report_response"]:
-            result += f"Response stored ({len(state['stock_report_response'])} characters)\n"
-            result += f"Preview: {state['stock_report_response'][:200]}...\n"
+            parts.append(f"Response stored ({len(state['stock_report_response'])} characters)\n")
+            parts.append(f"Preview: {state['stock_report_response'][:200]}...\n")
         else:
-            result += "No stock report response stored yet.\n"
+            parts.append("No stock report response stored yet.\n")
 
-        return result
+        return "".join(parts)
 
     def answer_general_stock_question(self, question: str):
         """
@@ -1475,10 +1621,11 @@ Return ONLY a JSON array of uppercase ticker symbols. If a name is already a tic
         share_counts = state.get("share_counts", {})
         share_counts_section = ""
         if share_counts:
-            share_counts_section = "\n**SHARE COUNTS (for SELL recommendations):**\n"
-            for ticker, shares in share_counts.items():
-                share_counts_section += f"- {ticker}: {shares} shares\n"
-            share_counts_section += "\n**CRITICAL:** Only stocks with known share counts above can have SELL recommendations. Stocks without share counts should be marked HOLD instead of SELL.\n"
+            share_counts_section = "".join([
+                "\n**SHARE COUNTS (for SELL recommendations):**\n",
+                *(_SHARE_COUNT_LINE_TEMPLATE.format(ticker=ticker, shares=shares) for ticker, shares in share_counts.items()),
+                "\n**CRITICAL:** Only stocks with known share counts above can have SELL recommendations. Stocks without share counts should be marked HOLD instead of SELL.\n",
+            ])
         else:
             share_counts_section = "\n**SHARE COUNTS:** Not provided. SELL recommendations cannot be made without share counts.\n"
 
@@ -1517,31 +1664,19 @@ Return ONLY a JSON array of uppercase ticker symbols. If a name is already a tic
 
     def get_agent_status(self):
         """Returns the status of connected agents for debugging purposes."""
-        result = "**Connected Agents Status:**\n\n"
-        
         if not self.remote_agent_connections:
-            result += "❌ **No agents connected.**\n\n"
-            result += "**Troubleshooting Steps:**\n"
-            result += "1. **Check if agents are running:**\n"
-            result += "   - Stock Analyser Agent should be running on port 10002\n"
-            result += "   - Stock Report Analyser Agent should be running on port 10003\n"
-            result += "2. **Start the agents:**\n"
-            result += "   - Navigate to stockanalyser_agent directory and run: `python -m __main__`\n"
-            result += "   - Navigate to stockreport_analyser_agent directory and run: `python -m __main__`\n"
-            result += "3. **Check ports:** Ensure ports 10002 and 10003 are not being used by other applications\n"
-            result += "4. **Restart host agent:** After starting the agents, restart this host agent\n\n"
-            result += "**Expected URLs:**\n"
-            result += "- http://localhost:10002 (Stock Analyser Agent)\n"
-            result += "- http://localhost:10003 (Stock Report Analyser Agent)\n"
-            return result
-        
+            return _NO_AGENTS_STATUS
+
+        buf = io.StringIO()
+        w = buf.write
+        w("**Connected Agents Status:**\n\n")
         for agent_name, connection in self.remote_agent_connections.items():
-            result += f"✅ **{agent_name}**: Connected\n"
-            result += f"   - URL: {connection.agent_url}\n"
-            result += f"   - Description: {connection.agent_card.description}\n"
-            result += f"   - Skills: {[skill.name for skill in connection.agent_card.skills]}\n\n"
-        
-        result += f"**Total Connected Agents:** {len(self.remote_agent_connections)}"
+            w(f"✅ **{agent_name}**: Connected\n")
+            w(f"   - URL: {connection.agent_url}\n")
+            w(f"   - Description: {connection.agent_card.description}\n")
+            w(f"   - Skills: {[skill.name for skill in connection.agent_card.skills]}\n\n")
+        w(f"**Total Connected Agents:** {len(self.remote_agent_connections)}")
+        result = buf.getvalue()
         logger.info(f"Agent status requested. Connected agents: {list(self.remote_agent_connections.keys())}")
         return result
 
@@ -1852,22 +1987,17 @@ Return ONLY a JSON array of uppercase ticker symbols. If a name is already a tic
         Returns:
             Tuple of (is_valid, error_message, valid_tickers, invalid_tickers)
         """
-        from google import genai
         from google.genai.types import GenerateContentConfig
 
         try:
             logger.info(f"Validating {len(tickers)} tickers against market preference: {market_preference}")
 
-            # Create the client with proper configuration
-            if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-                client = genai.Client(vertexai=True)
-            else:
-                api_key = os.getenv("GOOGLE_API_KEY")
-                if not api_key:
-                    logger.error("No GOOGLE_API_KEY found for stock validation")
-                    # If no API key, skip validation (lenient fallback)
-                    return True, "", tickers, []
-                client = genai.Client(api_key=api_key)
+            # Reuse the process-wide Gemini client
+            client = get_genai_client()
+            if client is None:
+                logger.error("No GOOGLE_API_KEY found for stock validation")
+                # If no API key, skip validation (lenient fallback)
+                return True, "", tickers, []
 
             tickers_str = ", ".join(tickers)
             expected_market = "US" if market_preference == "US" else "India"
@@ -1974,61 +2104,44 @@ Check if ALL tickers belong to {expected_market} market. Return valid and invali
         category_upper = category.upper()
         if market_preference == "US":
             if not category_upper.startswith("USA_"):
-                error_msg = f"**Market Preference Mismatch**\n\n"
-                error_msg += f"You selected **US Market**, but requested category '{category}' is for Indian stocks.\n\n"
-                error_msg += "**Available US Categories:**\n"
-                error_msg += "• USA_TOP_TECHNOLOGY_STOCKS\n"
-                error_msg += "• USA_TOP_FINANCIAL_STOCKS\n"
-                error_msg += "• USA_TOP_AUTOMOBILE_STOCKS\n"
+                error_msg = "".join([
+                    "**Market Preference Mismatch**\n\n",
+                    f"You selected **US Market**, but requested category '{category}' is for Indian stocks.\n\n",
+                    "**Available US Categories:**\n",
+                    "• USA_TOP_TECHNOLOGY_STOCKS\n",
+                    "• USA_TOP_FINANCIAL_STOCKS\n",
+                    "• USA_TOP_AUTOMOBILE_STOCKS\n",
+                ])
                 logger.warning(f"Category '{category}' doesn't match US market preference")
                 return error_msg
         elif market_preference == "INDIA":
             if not category_upper.startswith("INDIA_"):
-                error_msg = f"**Market Preference Mismatch**\n\n"
-                error_msg += f"You selected **Indian Market**, but requested category '{category}' is for US stocks.\n\n"
-                error_msg += "**Available Indian Categories:**\n"
-                error_msg += "• INDIA_TOP_TECHNOLOGY_STOCKS\n"
-                error_msg += "• INDIA_TOP_FINANCIAL_STOCKS\n"
-                error_msg += "• INDIA_TOP_AUTOMOBILE_STOCKS\n"
+                error_msg = "".join([
+                    "**Market Preference Mismatch**\n\n",
+                    f"You selected **Indian Market**, but requested category '{category}' is for US stocks.\n\n",
+                    "**Available Indian Categories:**\n",
+                    "• INDIA_TOP_TECHNOLOGY_STOCKS\n",
+                    "• INDIA_TOP_FINANCIAL_STOCKS\n",
+                    "• INDIA_TOP_AUTOMOBILE_STOCKS\n",
+                ])
                 logger.warning(f"Category '{category}' doesn't match INDIA market preference")
                 return error_msg
 
-        stock_data_path = os.path.join(os.path.dirname(__file__), "stock_data.json")
-
-        if not os.path.exists(stock_data_path):
-            return "Error: stock_data.json not found. Please ensure it's in the correct directory."
-
         try:
-            with open(stock_data_path, "r") as f:
-                stock_data = json.load(f)
+            # Listings are pre-rendered per stock_data.json version, so this is a dict lookup
+            listings, market_categories = _get_category_index()
 
-            if category not in stock_data:
+            if category not in listings:
                 # Show only categories matching the user's market preference
-                all_categories = list(stock_data.keys())
-                if market_preference == "US":
-                    available_categories = [cat for cat in all_categories if cat.startswith("USA_")]
-                    market_name = "US"
-                else:
-                    available_categories = [cat for cat in all_categories if cat.startswith("INDIA_")]
-                    market_name = "Indian"
+                market_name = "US" if market_preference == "US" else "Indian"
+                available_categories = market_categories["US" if market_preference == "US" else "INDIA"]
+                return f"Error: Category '{category}' not found. Available {market_name} categories:\n" + available_categories
 
-                return f"Error: Category '{category}' not found. Available {market_name} categories:\n" + "\n".join(available_categories)
-            
-            stocks_in_category = stock_data[category]
-            if not stocks_in_category:
+            stock_count, result = listings[category]
+            if not stock_count:
                 return f"No stocks found in category: {category}."
-            
-            result = f"**Top stocks for category '{category}':**\n\n"
-            result += f"**Number of stocks:** {len(stocks_in_category)}\n\n"
-            result += "**Stock tickers:**\n"
-            for i, stock in enumerate(stocks_in_category, 1):
-                result += f"{i}. {stock}\n"
-            
-            result += f"\n**Analysis:**\n"
-            result += f"These {len(stocks_in_category)} stocks represent the top performers in this category and can be considered for portfolio allocation.\n"
-            result += f"You can add selected stocks to your analysis using the `add_new_stocks` tool."
-            
-            logger.info(f"Retrieved {len(stocks_in_category)} stocks for category: {category}")
+
+            logger.info(f"Retrieved {stock_count} stocks for category: {category}")
             return result
             
         except FileNotFoundError:
@@ -2036,8 +2149,9 @@ Check if ALL tickers belong to {expected_market} market. Return valid and invali
         except json.JSONDecodeError:
             return "Error: Failed to decode stock_data.json file."
         except Exception as e:
-            logger.error(f"Error suggesting stocks by category: {e}")
-            return f"Error suggesting stocks by category: {e}"
+            error_msg = f"Error suggesting stocks by category: {e}"
+            logger.error(error_msg)
+            return error_msg
 
 
 def _get_initialized_host_agent_sync():
@@ -2054,7 +2168,7 @@ def _get_initialized_host_agent_sync():
             remote_agent_addresses=agent_urls
         )
         logger.info("HostAgent initialized")
-        return hosting_agent_instance.create_agent()
+        return hosting_agent_instance._agent
 
     try:
         return asyncio.run(_async_main())
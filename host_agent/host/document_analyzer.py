@@ -13,9 +13,11 @@ import io
 import os
 import json
 import logging
-from typing import Tuple
+import threading
+from typing import Optional, Tuple
+import httpx
 from google import genai
-from google.genai.types import GenerateContentConfig, Part
+from google.genai.types import GenerateContentConfig, HttpOptions, Part
 from PIL import Image
 
 # Import database functions and config at the top
@@ -33,6 +35,36 @@ except ImportError:
 logger = logging.getLogger("host_agent_api.document_analyzer")
 logger.setLevel(logging.INFO)
 
+# Document verification, ticker extraction and the chat endpoints all call Gemini through the sync
+# client from FastAPI's worker threads; sizing the sync pool for that lets concurrent uploads reuse
+# warm connections instead of handshaking again once httpx's 5s keep-alive expiry passes.
+# pdf_analyzer and host.agent import get_genai_client from here rather than building their own
+_GENAI_HTTP_OPTIONS = HttpOptions(
+    client_args={
+        "limits": httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30),
+    },
+)
+_genai_client = None
+_genai_client_lock = threading.Lock()
+
+
+def get_genai_client() -> Optional[genai.Client]:
+    """Returns the host's process-wide Gemini client, or None when no Vertex AI / API key credentials exist."""
+    global _genai_client
+    if _genai_client is None:
+        with _genai_client_lock:
+            if _genai_client is None:
+                if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
+                    _genai_client = genai.Client(vertexai=True, http_options=_GENAI_HTTP_OPTIONS)
+                    logger.info("Created shared Gemini client using Vertex AI")
+                else:
+                    api_key = os.getenv("GOOGLE_API_KEY")
+                    if not api_key:
+                        return None
+                    _genai_client = genai.Client(api_key=api_key, http_options=_GENAI_HTTP_OPTIONS)
+                    logger.info("Created shared Gemini client using Google AI API")
+    return _genai_client
+
 
 def verify_portfolio_document(file_bytes: bytes, file_format: str) -> Tuple[bool, str]:
     """
@@ -51,17 +83,11 @@ def verify_portfolio_document(file_bytes: bytes, file_format: str) -> Tuple[bool
     try:
         logger.info(f"Verifying {file_format} document ({len(file_bytes)} bytes)")
 
-        # Create the client with proper configuration
-        if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-            client = genai.Client(vertexai=True)
-            logger.info("Using Vertex AI for document verification")
-        else:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                logger.error("No GOOGLE_API_KEY found for document verification")
-                return False, "**Error**: Google API key not configured. Please set GOOGLE_API_KEY environment variable."
-            client = genai.Client(api_key=api_key)
-            logger.info("Using Google AI API for document verification")
+        # Reuse the process-wide Gemini client
+        client = get_genai_client()
+        if client is None:
+            logger.error("No GOOGLE_API_KEY found for document verification")
+            return False, "**Error**: Google API key not configured. Please set GOOGLE_API_KEY environment variable."
 
         # System prompt for document verification
         system_prompt = """You are an expert financial document analyst specializing in portfolio statements and investment reports.
@@ -210,17 +236,11 @@ def verify_text_portfolio(text_input: str) -> Tuple[bool, str]:
         if len(text_input.strip()) < 10:
             return False, "**Invalid Input**: Please provide portfolio information with stock tickers or company names."
 
-        # Create the client with proper configuration
-        if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-            client = genai.Client(vertexai=True)
-            logger.info("Using Vertex AI for text verification")
-        else:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                logger.error("No GOOGLE_API_KEY found for text verification")
-                return False, "**Error**: Google API key not configured."
-            client = genai.Client(api_key=api_key)
-            logger.info("Using Google AI API for text verification")
+        # Reuse the process-wide Gemini client
+        client = get_genai_client()
+        if client is None:
+            logger.error("No GOOGLE_API_KEY found for text verification")
+            return False, "**Error**: Google API key not configured."
 
         # System prompt for text verification
         system_prompt = """You are an expert financial analyst specializing in portfolio data analysis.
@@ -363,8 +383,9 @@ def read_pdf_document(file_bytes: bytes) -> str:
         return text
 
     except Exception as e:
-        logger.error(f"Error processing PDF: {e}")
-        return f"Error processing PDF: {e}"
+        error_msg = f"Error processing PDF: {e}"
+        logger.error(error_msg)
+        return error_msg
 
 
 def read_image_document(file_bytes: bytes) -> str:
@@ -385,16 +406,10 @@ def read_image_document(file_bytes: bytes) -> str:
         logger.info(f"Image format: {image.format}, Size: {image.size}")
 
         # Use Google Gemini Vision to extract text
-        if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-            client = genai.Client(vertexai=True)
-            logger.info("Using Vertex AI for image text extraction")
-        else:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                logger.error("No GOOGLE_API_KEY found for image text extraction")
-                return "**Error**: Google API key not configured for image extraction. Please set GOOGLE_API_KEY environment variable."
-            client = genai.Client(api_key=api_key)
-            logger.info("Using Google AI API for image text extraction")
+        client = get_genai_client()
+        if client is None:
+            logger.error("No GOOGLE_API_KEY found for image text extraction")
+            return "**Error**: Google API key not configured for image extraction. Please set GOOGLE_API_KEY environment variable."
 
         # System prompt for extracting portfolio data from image
         system_prompt = """You are an expert financial analyst analyzing portfolio screenshots or images.
@@ -435,8 +450,9 @@ Extract and format the information in a clear, structured way that preserves all
             return "Error: Could not extract text from image"
 
     except Exception as e:
-        logger.error(f"Error processing image: {e}")
-        return f"Error processing image: {e}"
+        error_msg = f"Error processing image: {e}"
+        logger.error(error_msg)
+        return error_msg
 
 
 def read_portfolio_document(session_id: str = "", user_name: str = "", input_format: str = "") -> Tuple[str, str]:
@@ -538,7 +554,7 @@ def read_portfolio_document(session_id: str = "", user_name: str = "", input_for
                         break
                     except Exception as e:
                         # Catch any exception (404, NoSuchKey, etc.) and continue
-                        logger.debug(f"File not found with extension {ext}: {e}")
+                        logger.debug("File not found with extension %s: %s", ext, e)
                         continue
 
                 if not file_bytes:
@@ -598,17 +614,11 @@ def validate_exchange_consistency(holdings_data: list, user_market_preference: s
 
         logger.info(f"Validating exchange consistency for {len(holdings_data)} holdings")
 
-        # Create the client with proper configuration
-        if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-            client = genai.Client(vertexai=True)
-            logger.info("Using Vertex AI for exchange validation")
-        else:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                logger.error("No GOOGLE_API_KEY found for exchange validation")
-                return False, "**Error**: Google API key not configured for validation.", "Unknown"
-            client = genai.Client(api_key=api_key)
-            logger.info("Using Google AI API for exchange validation")
+        # Reuse the process-wide Gemini client
+        client = get_genai_client()
+        if client is None:
+            logger.error("No GOOGLE_API_KEY found for exchange validation")
+            return False, "**Error**: Google API key not configured for validation.", "Unknown"
 
         # Extract just the tickers for validation
         tickers = [holding.get('ticker', '') for holding in holdings_data if holding.get('ticker')]
@@ -857,17 +867,11 @@ def extract_stock_tickers_from_text(portfolio_text: str, user_market_preference:
     try:
         logger.info(f"Starting LLM-based stock ticker extraction from {len(portfolio_text)} characters of text")
 
-        # Create the client with proper configuration
-        if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-            client = genai.Client(vertexai=True)
-            logger.info("Using Vertex AI for ticker extraction")
-        else:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                logger.error("No GOOGLE_API_KEY found for ticker extraction")
-                return "**Error**: Google API key not configured for ticker extraction. Please set GOOGLE_API_KEY environment variable."
-            client = genai.Client(api_key=api_key)
-            logger.info("Using Google AI API for ticker extraction")
+        # Reuse the process-wide Gemini client
+        client = get_genai_client()
+        if client is None:
+            logger.error("No GOOGLE_API_KEY found for ticker extraction")
+            return "**Error**: Google API key not configured for ticker extraction. Please set GOOGLE_API_KEY environment variable."
 
         # System prompt for stock ticker extraction with share quantities
         system_prompt = """You are an expert financial analyst specializing in analyzing portfolio data and extracting stock holdings information.
@@ -1013,45 +1017,45 @@ Provide only the comma-separated ticker list with percentages as specified."""
             logger.info(f"Applied exchange suffix for {primary_exchange} stocks")
 
         # Format the result with detailed holdings information
-        result = f"**Portfolio Holdings Extracted:**\n\n"
-        result += f"Total assets identified: {len(holdings_data)}\n\n"
+        # Collected in a list and joined once rather than re-copying the growing string per holding
+        parts = [f"**Portfolio Holdings Extracted:**\n\nTotal assets identified: {len(holdings_data)}\n\n"]
 
         # Separate holdings into those with shares and those without
         with_shares = [h for h in holdings_data if h.get('shares', 0) > 0]
         without_shares = [h for h in holdings_data if h.get('shares', 0) == 0]
 
         if with_shares:
-            result += "**Holdings with Share Quantities:**\n"
+            parts.append("**Holdings with Share Quantities:**\n")
             for holding in with_shares:
                 ticker = holding.get('ticker', 'N/A')
                 shares = holding.get('shares', 0)
                 allocation = holding.get('allocation_pct', 'N/A')
                 amount = holding.get('amount', 'N/A')
-                result += f"• {ticker}: {shares} shares"
+                parts.append(f"• {ticker}: {shares} shares")
                 if allocation != 'N/A' and allocation:
-                    result += f" ({allocation})"
+                    parts.append(f" ({allocation})")
                 if amount != 'N/A' and amount:
-                    result += f" - {amount}"
-                result += "\n"
-            result += "\n"
+                    parts.append(f" - {amount}")
+                parts.append("\n")
+            parts.append("\n")
 
         if without_shares:
-            result += "**Holdings Missing Share Counts (will ask user):**\n"
+            parts.append("**Holdings Missing Share Counts (will ask user):**\n")
             for holding in without_shares:
                 ticker = holding.get('ticker', 'N/A')
                 allocation = holding.get('allocation_pct', 'N/A')
                 amount = holding.get('amount', 'N/A')
-                result += f"• {ticker}"
+                parts.append(f"• {ticker}")
                 if allocation != 'N/A' and allocation:
-                    result += f" ({allocation})"
+                    parts.append(f" ({allocation})")
                 if amount != 'N/A' and amount:
-                    result += f" - {amount}"
-                result += "\n"
+                    parts.append(f" - {amount}")
+                parts.append("\n")
 
         # Store holdings data as JSON string for later use
-        result += f"\n**HOLDINGS_DATA_JSON:**\n{json.dumps(holdings_data)}\n"
+        parts.append(f"\n**HOLDINGS_DATA_JSON:**\n{json.dumps(holdings_data)}\n")
 
-        return result
+        return "".join(parts)
 
     except Exception as e:
         logger.error(f"Error in extract_stock_tickers_from_text: {e}")
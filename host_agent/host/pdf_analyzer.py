@@ -10,9 +10,10 @@ import fitz  # PyMuPDF
 import io
 import os
 import logging
-from google import genai
 from google.genai.types import GenerateContentConfig
 
+from .document_analyzer import get_genai_client
+
 # Import database functions and config at the top
 try:
     from database import get_db, mark_portfolio_statement_uploaded
@@ -140,18 +141,11 @@ def extract_stock_tickers_from_portfolio(portfolio_text: str) -> str:
     try:
         logger.info(f"Starting LLM-based stock ticker extraction from {len(portfolio_text)} characters of text")
 
-        # Create the client with proper configuration
-        # Check if we should use Vertex AI or API key
-        if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-            client = genai.Client(vertexai=True)
-            logger.info("Using Vertex AI for ticker extraction")
-        else:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                logger.error("No GOOGLE_API_KEY found for ticker extraction")
-                return "**Error**: Google API key not configured for ticker extraction. Please set GOOGLE_API_KEY environment variable."
-            client = genai.Client(api_key=api_key)
-            logger.info("Using Google AI API for ticker extraction")
+        # Reuse the shared client so its HTTPS connection pool survives across extractions
+        client = get_genai_client()
+        if client is None:
+            logger.error("No GOOGLE_API_KEY found for ticker extraction")
+            return "**Error**: Google API key not configured for ticker extraction. Please set GOOGLE_API_KEY environment variable."
 
         # System prompt for stock ticker extraction
         system_prompt = """You are an expert financial analyst specializing in analyzing portfolio statements and identifying stock ticker symbols.
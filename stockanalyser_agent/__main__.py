@@ -9,7 +9,7 @@ from a2a.types import (
     AgentCard,
     AgentSkill,
 )
-from agent import create_agent
+from agent import close_agent, create_agent
 from agent_executor import StockAnalyserAgentExecutor
 from dotenv import load_dotenv
 from google.adk.artifacts import InMemoryArtifactService
@@ -98,6 +98,9 @@ def main():
 
         logger.info("Added custom /health endpoint")
 
+        # Close the webhook client's pooled connections when the server stops
+        app.add_event_handler("shutdown", close_agent)
+
         uvicorn.run(app, host=host, port=port)
     except MissingAPIKeyError as e:
         logger.error(f"Error: {e}")
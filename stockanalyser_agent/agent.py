@@ -6,25 +6,26 @@ from google.adk.tools.mcp_tool.mcp_toolset import (
 from mcp import StdioServerParameters
 from google.adk.tools import FunctionTool
 # Schema imports removed - using basic FunctionTool without explicit schemas
+import hashlib
+import io
 import json
+import logging
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set, Tuple
+from collections import OrderedDict
+from functools import lru_cache
 from datetime import datetime
 import asyncio
-import concurrent.futures
-import traceback
-import requests
+import httpx
+import orjson
 import base64
 import re
 import time
 import random
+import threading
 from logger import setup_logging, get_logger
-import asyncio
-from functools import wraps
 from google import genai
 from google.genai.types import GenerateContentConfig, HttpOptions
-from database import get_db, save_stock_recommendation, save_portfolio_analysis
-from openai import OpenAI
 from config import current_config
 
 # Setup logging and get log file path
@@ -32,96 +33,62 @@ log_file_path = setup_logging()
 logger = get_logger(__name__)
 logger.info(f"Logging initialized. Log file: {log_file_path}")
 
+# Date shown in the ALLOCATION BREAKDOWN heading of the emailed report, e.g. "January 05, 2026"
+_REPORT_DATE_FORMAT = "%B %d, %Y"
 
-class StockAnalyzerAgent:
-    """Stock analyzer agent that handles portfolio analysis and stock recommendations."""
-    
-    def __init__(self):
-        """Initialize the stock analyzer agent with instance variables and tools."""
-        # Instance variables instead of global variables
-        self.investment_amount = ""
-        self.email_id = ""
-        self.portfolio_analysis = ""
-        self.user_id = ""
-        self.session_id = ""
-        self.stock_analysis_data = {}  # Store stock analysis data in memory
-        self.stock_current_prices = {}  # Store current prices separately for easier access
-        self.stock_share_counts = {}  # Store share counts for existing stocks
-        self.existing_stocks = []  # Track existing portfolio stocks
-        self.new_stocks = []  # Track new stocks to analyze
-        
-        # Initialize MCP tool
-        # Get MCP directory from config (environment-aware)
-        mcp_directory = current_config.MCP_DIRECTORY
-        logger.info(f"Using MCP directory: {mcp_directory}")
+# Webhook bodies above this size are gzip-compressed when ACTIVEPIECES_GZIP_PAYLOAD is enabled
+_GZIP_MIN_BYTES = 4096
 
-        # Prepare environment variables for MCP server (no longer needs FINNHUB_API_KEY)
-        mcp_env = {**os.environ}
-        mcp_env["MCP_TIMEOUT"] = os.getenv("MCP_TIMEOUT", "30")  # Default 30 seconds
+# Static <head> of the HTML email report; convert_portfolio_analysis_to_html writes the body after it
+_REPORT_HTML_HEAD = '''<html>
+<head>
+<style>
+body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 900px; margin: 0 auto; padding: 20px; background-color: #f5f5f5; }
+h1 { color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px; font-size: 24px; margin-top: 25px; }
+h2 { color: #34495e; margin-top: 30px; font-size: 20px; }
+h3 { color: #7f8c8d; margin-top: 20px; font-size: 16px; font-weight: bold; }
+.allocation { background-color: #ecf0f1; padding: 15px; border-radius: 5px; margin: 15px 0; }
+.stock-card { background-color: #ffffff; border-left: 6px solid #3498db; padding: 15px 20px; margin: 15px 0; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+.stock-card p { margin: 8px 0; line-height: 1.5; }
+.buy { border-left-color: #27ae60; background-color: #f0fcf4; }
+.hold { border-left-color: #f39c12; background-color: #fef9f0; }
+.sell { border-left-color: #e74c3c; background-color: #fef5f5; }
+.ticker { font-weight: bold; font-size: 18px; color: #2c3e50; }
+.recommendation { font-weight: bold; padding: 5px 12px; border-radius: 4px; display: inline-block; font-size: 14px; letter-spacing: 0.5px; }
+.rec-buy { background-color: #27ae60; color: white; }
+.rec-hold { background-color: #f39c12; color: white; }
+.rec-sell { background-color: #e74c3c; color: white; }
+ul { margin: 10px 0; }
+li { margin: 8px 0; }
+.warning { background-color: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 15px 0; }
+strong { color: #2c3e50; }
+</style>
+</head>
+<body>'''
 
-        # Use current Python interpreter (dependencies are now installed in stockanalyser_agent venv)
-        # This avoids the uv run overhead and virtual environment resolution issues
-        import sys
-        server_script = os.path.join(mcp_directory, "server.py")
-        command = sys.executable  # Use the current Python interpreter
-        args = [server_script]
+# Gateway errors from the webhook are retried with exponential backoff (0.3s, 0.6s, 1.2s)
+_WEBHOOK_RETRY_STATUSES = frozenset({502, 503, 504})
+_WEBHOOK_MAX_RETRIES = 3
+_WEBHOOK_BACKOFF_FACTOR = 0.3
 
-        connection_params = StdioConnectionParams(
-            server_params=StdioServerParameters(
-                command=command,
-                args=args,
-                env=mcp_env,
-            )
-        )
-        self.stock_mcp_tool = MCPToolset(
-            connection_params=connection_params,
-        )
-        
-        # Create function tools with instance methods
-        self.execute_programmatic_flow_tool = FunctionTool(self.execute_programmatic_flow)
-        self.extract_stocks_from_analysis_request_tool = FunctionTool(self.extract_stocks_from_analysis_request)
-        self.get_expert_portfolio_recommendations_tool = FunctionTool(self.get_expert_portfolio_recommendations)
-        self.save_stock_analysis_to_memory_tool = FunctionTool(self.save_stock_analysis_to_memory)
-        self.save_portfolio_analysis_tool = FunctionTool(self.save_portfolio_analysis)
-        self.send_analysis_to_webhook_tool = FunctionTool(self.send_analysis_to_webhook)
+# How long the flow waits, after the database save, for the background webhook post before
+# reporting delivery as still in progress
+_WEBHOOK_RESULT_WAIT_SECONDS = 30
 
-    def extract_stocks_from_analysis_request(self, analysis_request: str) -> str:
-        """
-        Uses LLM to extract stock tickers from a comprehensive analysis request.
 
-        Args:
-            analysis_request (str): The comprehensive analysis request containing stock lists and investment details
+def _new_webhook_client() -> httpx.AsyncClient:
+    """Builds the pooled async HTTP client used for webhook posts."""
+    return httpx.AsyncClient(
+        timeout=30,
+        limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+        transport=httpx.AsyncHTTPTransport(retries=2),
+        headers={"Content-Type": "application/json"},
+    )
 
-        Returns:
-            str: JSON string with extracted stock lists in format {"existing_stocks": [], "new_stocks": []}
-        """
-        try:
-            logger.info(f"extract_stocks_from_analysis_request called with analysis request: {analysis_request}")
-            # Validate input parameter
-            if not analysis_request or not isinstance(analysis_request, str):
-                logger.error(f"Invalid analysis_request parameter: {analysis_request}")
-                return "**Error**: analysis_request must be a non-empty string"
-            
-            # Log the analysis request for debugging
-            logger.info(f"Using LLM to extract stocks from analysis request: {len(analysis_request)} characters")
-            
-            # Create the client with proper configuration
-            import os
-            
-            # Check if we should use Vertex AI or API key
-            if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-                client = genai.Client(vertexai=True)
-                logger.info("Using Vertex AI for stock extraction")
-            else:
-                api_key = os.getenv("GOOGLE_API_KEY")
-                if not api_key:
-                    logger.error("No GOOGLE_API_KEY found for stock extraction")
-                    return "**Error**: Google API key not configured for stock extraction"
-                client = genai.Client(api_key=api_key)
-                logger.info("Using Google AI API for stock extraction")
-            
-            # System prompt for stock extraction
-            system_prompt = """You are a stock ticker extraction specialist. Your sole task is to extract stock ticker symbols and share counts from analysis requests.
+
+# Single extraction prompt and schema shared by stock extraction and investment details extraction,
+# so both tools resolve to the same cached Gemini call for a given request
+_STOCK_EXTRACTION_PROMPT = """You are a stock ticker extraction specialist. Your sole task is to extract stock ticker symbols and share counts from analysis requests.
 
 TASK:
 Extract stock tickers from the analysis request and categorize them as existing portfolio stocks or new stocks to analyze.
@@ -136,198 +103,261 @@ RULES:
 - Extract share counts for existing stocks if mentioned (e.g., "10 shares of AAPL", "5.5 TSLA shares")
 - Also extract the investment amount, email ID, user ID, and session ID if present
 
-OUTPUT FORMAT (respond with ONLY these lines):
-EXISTING: TICKER1, TICKER2, TICKER3 (or NONE if no existing stocks)
-NEW: TICKER1, TICKER2, TICKER3 (or NONE if no new stocks)
-SHARES: TICKER1=10, TICKER2=5.5, TICKER3=20 (share counts for existing stocks, or NONE if not mentioned)
-INVESTMENT_AMOUNT: amount (numeric value only, or 0 if not found)
-EMAIL_ID: email@example.com (or not_found if not present)
-USER_ID: user_id (or not_found if not present)
-SESSION_ID: session_id (or not_found if not present)
+OUTPUT FORMAT (respond with ONLY a JSON object with these fields):
+- existing_stocks: list of tickers (empty list if no existing stocks)
+- new_stocks: list of tickers (empty list if no new stocks)
+- share_counts: list of {"ticker", "shares"} for existing stocks (empty list if not mentioned)
+- investment_amount: numeric value only as a string ("0" if not found)
+- email_id, user_id, session_id: the value, or "not_found" if not present
 
 EXAMPLES:
 Input: "I have 10 shares of Apple and 5 shares of Microsoft in my portfolio. I want to invest $5000 in Tesla and Amazon. Email: john@example.com"
 Output:
-EXISTING: AAPL, MSFT
-NEW: TSLA, AMZN
-SHARES: AAPL=10, MSFT=5
-INVESTMENT_AMOUNT: 5000
-EMAIL_ID: john@example.com
-USER_ID: not_found
-SESSION_ID: not_found
+{"existing_stocks": ["AAPL", "MSFT"], "new_stocks": ["TSLA", "AMZN"], "share_counts": [{"ticker": "AAPL", "shares": 10}, {"ticker": "MSFT", "shares": 5}], "investment_amount": "5000", "email_id": "john@example.com", "user_id": "not_found", "session_id": "not_found"}
 
 Input: "Analyze my NVDA (20 shares), VOO (15.5 shares) and suggest new stocks PLTR, GOOGL for $10000. USER ID: user123 SESSION ID: sess456"
 Output:
-EXISTING: NVDA, VOO
-NEW: PLTR, GOOGL
-SHARES: NVDA=20, VOO=15.5
-INVESTMENT_AMOUNT: 10000
-EMAIL_ID: not_found
-USER_ID: user123
-SESSION_ID: sess456
+{"existing_stocks": ["NVDA", "VOO"], "new_stocks": ["PLTR", "GOOGL"], "share_counts": [{"ticker": "NVDA", "shares": 20}, {"ticker": "VOO", "shares": 15.5}], "investment_amount": "10000", "email_id": "not_found", "user_id": "user123", "session_id": "sess456"}
 
 Input: "I own Apple, Microsoft, Tesla. Want to invest $3000 in Amazon and Google."
 Output:
-EXISTING: AAPL, MSFT, TSLA
-NEW: AMZN, GOOGL
-SHARES: NONE
-INVESTMENT_AMOUNT: 3000
-EMAIL_ID: not_found
-USER_ID: not_found
-SESSION_ID: not_found"""
-
-            # Generate stock extraction using LLM with retry logic
-            logger.info("Generating stock extraction using LLM")
-            max_retries = 3
-            base_delay = 2.0
-            response = None
-
-            for attempt in range(max_retries):
-                try:
-                    if attempt > 0:
-                        import random
-                        delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                        logger.info(f"Retrying stock extraction after {delay:.2f}s delay (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(delay)
-
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        contents=analysis_request,
-                        config=GenerateContentConfig(
-                            system_instruction=[system_prompt]
-                        )
-                    )
-
-                    # If we get here, the call was successful
-                    logger.info(f"Successfully generated stock extraction {response.text})")
-                    break
-
-                except Exception as e:
-                    error_message = str(e)
-                    is_api_error = any(code in error_message for code in ["500", "503", "INTERNAL", "UNAVAILABLE"])
-
-                    if attempt == max_retries - 1:
-                        # Last attempt failed, re-raise the exception
-                        logger.error(f"Failed to generate stock extraction after {max_retries} attempts: {e}")
-                        raise
-
-                    if is_api_error:
-                        logger.warning(f"Google AI API error on attempt {attempt + 1}: {e}")
-                    else:
-                        logger.warning(f"Non-API error on attempt {attempt + 1}: {e}")
-                        # For non-API errors, fail immediately
-                        raise
-
-            logger.info("Received LLM response for stock extraction")
-
-            existing_stocks = []
-            new_stocks = []
-            self.stock_share_counts = {}  # Reset share counts
+{"existing_stocks": ["AAPL", "MSFT", "TSLA"], "new_stocks": ["AMZN", "GOOGL"], "share_counts": [], "investment_amount": "3000", "email_id": "not_found", "user_id": "not_found", "session_id": "not_found"}"""
+
+_STOCK_EXTRACTION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "existing_stocks": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "new_stocks": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "share_counts": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"ticker": {"type": "STRING"}, "shares": {"type": "NUMBER"}},
+                "required": ["ticker", "shares"],
+            },
+        },
+        "investment_amount": {"type": "STRING"},
+        "email_id": {"type": "STRING"},
+        "user_id": {"type": "STRING"},
+        "session_id": {"type": "STRING"},
+    },
+    "required": [
+        "existing_stocks", "new_stocks", "share_counts",
+        "investment_amount", "email_id", "user_id", "session_id",
+    ],
+}
+
+# The request config never changes, so it is built once instead of on every extraction call
+_STOCK_EXTRACTION_CONFIG = GenerateContentConfig(
+    system_instruction=[_STOCK_EXTRACTION_PROMPT],
+    temperature=0.0,  # Deterministic extraction
+    response_mime_type="application/json",
+    response_schema=_STOCK_EXTRACTION_SCHEMA,
+)
 
-            if response and response.text:
-                # Parse the LLM response
-                response_text = response.text.strip()
-                logger.info(f"LLM stock extraction response: {response_text}")
 
-                # Parse the response lines
-                lines = response_text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith("EXISTING:"):
-                        stocks_text = line.replace("EXISTING:", "").strip()
-                        if stocks_text and stocks_text.upper() != "NONE":
-                            existing_stocks = [s.strip().upper() for s in stocks_text.split(',') if s.strip()]
-                    elif line.startswith("NEW:"):
-                        stocks_text = line.replace("NEW:", "").strip()
-                        if stocks_text and stocks_text.upper() != "NONE":
-                            new_stocks = [s.strip().upper() for s in stocks_text.split(',') if s.strip()]
-                    elif line.startswith("SHARES:"):
-                        shares_text = line.replace("SHARES:", "").strip()
-                        if shares_text and shares_text.upper() != "NONE":
-                            # Parse share counts: AAPL=10, MSFT=5.5
-                            share_pairs = [s.strip() for s in shares_text.split(',') if s.strip()]
-                            for pair in share_pairs:
-                                if '=' in pair:
-                                    ticker, count = pair.split('=')
-                                    try:
-                                        self.stock_share_counts[ticker.strip().upper()] = float(count.strip())
-                                    except ValueError:
-                                        logger.warning(f"Could not parse share count for {ticker}: {count}")
-                    elif line.startswith("INVESTMENT_AMOUNT:"):
-                        self.investment_amount = line.replace("INVESTMENT_AMOUNT:", "").strip()
-                    elif line.startswith("EMAIL_ID:"):
-                        self.email_id = line.replace("EMAIL_ID:", "").strip()
-                    elif line.startswith("USER_ID:"):
-                        self.user_id = line.replace("USER_ID:", "").strip()
-                    elif line.startswith("SESSION_ID:"):
-                        self.session_id = line.replace("SESSION_ID:", "").strip()
-                
-            else:
-                logger.error("No response from LLM for stock extraction")
-                return "**Error**: Could not extract stocks using LLM. Please try again."
-            
-            # Create JSON result
-            result = {
-                "existing_stocks": existing_stocks,
-                "new_stocks": new_stocks
-            }
+# Gemini client shared by every LLM call so auth discovery and the HTTP connection pool are reused.
+# Per-stock analyses fan out concurrently, so the async pool keeps enough idle connections to skip
+# a TLS handshake per call (httpx defaults to 20 keep-alive connections with a 5s expiry)
+_GENAI_HTTP_OPTIONS = HttpOptions(
+    async_client_args={
+        "limits": httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30),
+    },
+)
+_genai_client = None
+_genai_client_lock = threading.Lock()
+
+
+def _get_genai_client() -> Optional[genai.Client]:
+    """Lazily builds the client used by extraction and per-stock analysis; None without Vertex AI or an API key."""
+    global _genai_client
+    if _genai_client is None:
+        with _genai_client_lock:
+            if _genai_client is None:
+                if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
+                    _genai_client = genai.Client(vertexai=True, http_options=_GENAI_HTTP_OPTIONS)
+                    logger.info("Created shared Gemini client using Vertex AI")
+                else:
+                    api_key = os.getenv("GOOGLE_API_KEY")
+                    if not api_key:
+                        return None
+                    _genai_client = genai.Client(api_key=api_key, http_options=_GENAI_HTTP_OPTIONS)
+                    logger.info("Created shared Gemini client using Google AI API")
+    return _genai_client
+
+
+# Extraction is a narrow NER task, so it runs on the smaller, faster Flash-Lite tier;
+# portfolio reasoning keeps the larger model
+_EXTRACTION_MODEL = "gemini-2.5-flash-lite"
+
+# LLM responses keyed by SHA-256 of (model, prompt inputs); entries expire after an hour.
+# Entries older than the refresh age are still served, but re-fetched in the background (stale-while-revalidate)
+_LLM_CACHE_TTL_SECONDS = 3600
+_LLM_CACHE_REFRESH_SECONDS = 300
+_LLM_CACHE_MAX_ENTRIES = 512
+_llm_response_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_llm_cache_lock = threading.Lock()
+_llm_inflight: Dict[str, asyncio.Future] = {}
+# Strong references to background refresh tasks so they are not garbage collected mid-flight
+_llm_refresh_tasks: Set[asyncio.Task] = set()
+
+
+def _llm_cache_key(*parts: str) -> str:
+    """Builds a cache key from the prompt inputs."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _get_cached_llm_entry(key: str) -> Optional[Tuple[float, str]]:
+    """Returns the (age in seconds, response text) cached for key, or None if missing or expired."""
+    with _llm_cache_lock:
+        entry = _llm_response_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, text = entry
+        age = time.monotonic() - stored_at
+        if age > _LLM_CACHE_TTL_SECONDS:
+            del _llm_response_cache[key]
+            return None
+        _llm_response_cache.move_to_end(key)
+        return age, text
+
+
+def _put_cached_llm_text(key: str, text: str) -> None:
+    """Stores response text for key, evicting the least recently used entry when full."""
+    with _llm_cache_lock:
+        _llm_response_cache[key] = (time.monotonic(), text)
+        _llm_response_cache.move_to_end(key)
+        while len(_llm_response_cache) > _LLM_CACHE_MAX_ENTRIES:
+            _llm_response_cache.popitem(last=False)
+
+
+async def _generate_extraction_text(client, contents: str, system_prompt: str, task_name: str, config: GenerateContentConfig) -> Optional[str]:
+    """
+    Runs an extraction prompt against Gemini with retries, serving repeated inputs from the cache.
+
+    Args:
+        client: The genai client to call
+        contents: The text to extract from
+        system_prompt: The extraction instructions carried by config, used in the cache key
+        task_name: Human-readable name used in log messages
+        config: Prebuilt request config with the system prompt and response schema
+
+    Returns:
+        The JSON response text, or None if the model returned nothing
+    """
+    model = _EXTRACTION_MODEL
+    cache_key = _llm_cache_key(model, system_prompt, contents)
+    cached = _get_cached_llm_entry(cache_key)
+    if cached is not None:
+        age, cached_text = cached
+        if age > _LLM_CACHE_REFRESH_SECONDS and cache_key not in _llm_inflight:
+            logger.info(f"Serving stale cached response for {task_name} and refreshing in the background")
+            task = asyncio.get_running_loop().create_task(
+                _refresh_extraction_text(client, model, cache_key, contents, task_name, config)
+            )
+            _llm_refresh_tasks.add(task)
+            task.add_done_callback(_llm_refresh_tasks.discard)
+        else:
+            logger.info(f"Using cached response for {task_name}")
+        return cached_text
+
+    # If an identical call is already in flight, wait for its result instead of issuing another
+    inflight = _llm_inflight.get(cache_key)
+    if inflight is not None:
+        logger.info(f"Joining in-flight LLM call for {task_name}")
+        return await asyncio.shield(inflight)
+    return await _fetch_extraction_text(client, model, cache_key, contents, task_name, config)
+
+
+async def _fetch_extraction_text(client, model: str, cache_key: str, contents: str, task_name: str, config: GenerateContentConfig) -> Optional[str]:
+    """Calls the model as the single in-flight request for cache_key and caches the response."""
+    inflight = asyncio.get_running_loop().create_future()
+    _llm_inflight[cache_key] = inflight
+
+    try:
+        response_text = await _call_extraction_model(client, model, contents, task_name, config)
+    except asyncio.CancelledError:
+        _llm_inflight.pop(cache_key, None)
+        inflight.cancel()
+        raise
+    except Exception as e:
+        _llm_inflight.pop(cache_key, None)
+        inflight.set_exception(e)
+        # Mark the exception retrieved so an unjoined future doesn't log "exception was never retrieved"
+        inflight.exception()
+        raise
+    if response_text:
+        _put_cached_llm_text(cache_key, response_text)
+    _llm_inflight.pop(cache_key, None)
+    inflight.set_result(response_text)
+    return response_text
+
+
+async def _refresh_extraction_text(client, model: str, cache_key: str, contents: str, task_name: str, config: GenerateContentConfig) -> None:
+    """Re-fetches a stale cache entry in the background; on failure the stale entry is kept until it expires."""
+    if cache_key in _llm_inflight:
+        # Another caller scheduled a refresh (or a fetch) for this key before this task started
+        return
+    try:
+        await _fetch_extraction_text(client, model, cache_key, contents, task_name, config)
+    except Exception as e:
+        logger.warning(f"Background refresh for {task_name} failed: {e}")
+
+
+async def _call_extraction_model(client, model: str, contents: str, task_name: str, config: GenerateContentConfig) -> Optional[str]:
+    """Calls Gemini for an extraction prompt, retrying transient API errors with exponential backoff."""
+    max_retries = 3
+    base_delay = 2.0
+    response = None
+
+    for attempt in range(max_retries):
+        try:
+            if attempt > 0:
+                delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
+                logger.info(f"Retrying {task_name} after {delay:.2f}s delay (attempt {attempt + 1}/{max_retries})")
+                await asyncio.sleep(delay)
+
+            # Native async client, so concurrent extractions overlap on the network instead of holding a thread each
+            response = await client.aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config,
+            )
 
-            logger.info(f"LLM-powered stock extraction complete: {len(existing_stocks)} existing, {len(new_stocks)} new stocks")
-            logger.info(f"Share counts extracted: {self.stock_share_counts}")
-            logger.info(f"Investment amount: {self.investment_amount}")
-            logger.info(f"Email id: {self.email_id}")
-            logger.info(f"User ID: {self.user_id}")
-            logger.info(f"Session ID: {self.session_id}")
+            # If we get here, the call was successful
+            logger.info(f"Successfully completed {task_name} (attempt {attempt + 1})")
+            break
 
-            return json.dumps(result)
-            
         except Exception as e:
-            logger.error(f"Error in LLM stock extraction: {str(e)}")
-            return f"Error extracting stocks from analysis request: {e}"
-
-    def get_expert_portfolio_recommendations(self, analysis_request: str = "") -> str:
-        """
-        Analyzes portfolio data from memory and provides comprehensive investment recommendations.
-        Reads both portfolio analysis and individual stock data to make buy/sell/hold decisions.
-        Uses Google's Gemini 3.0 Pro model for analysis.
-
-        Args:
-            analysis_request: Original portfolio analysis request containing current holdings information
-
-        Returns:
-            JSON string with comprehensive portfolio analysis with specific investment recommendations and amounts
-        """
-        try:
-            logger.info(f"get_expert_portfolio_recommendations called with investment amount: ${self.investment_amount}")
+            error_message = str(e)
+            is_api_error = any(code in error_message for code in ["500", "503", "INTERNAL", "UNAVAILABLE"])
 
-            if not self.stock_analysis_data:
-                logger.error("No stock analysis data available in memory")
-                return json.dumps({"error": "No stock analysis data available. Please ensure stocks have been analyzed first."})
+            if attempt == max_retries - 1:
+                # Last attempt failed, re-raise the exception
+                logger.error(f"Failed {task_name} after {max_retries} attempts: {e}")
+                raise
 
-            # Build text content from in-memory data
-            text_content_parts = []
-            for ticker, data in self.stock_analysis_data.items():
-                text_content_parts.append(f"\n{'='*50}\nTicker: {ticker}\nTimestamp: {data['timestamp']}\n{'='*50}\n{data['data']}\n")
+            if is_api_error:
+                logger.warning(f"Google AI API error on attempt {attempt + 1}: {e}")
+            else:
+                logger.warning(f"Non-API error on attempt {attempt + 1}: {e}")
+                # For non-API errors, fail immediately
+                raise
 
-            text_content = "\n".join(text_content_parts)
+    return response.text if response else None
 
-            logger.info(f"Successfully loaded portfolio data from memory")
-            logger.info(f"Found text content with {len(text_content)} characters for {len(self.stock_analysis_data)} stocks")
 
-            # Initialize Gemini client
-            if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-                client = genai.Client(vertexai=True)
-                logger.info("Using Vertex AI with Gemini 3.0 Pro for portfolio analysis")
-            else:
-                api_key = os.getenv("GOOGLE_API_KEY")
-                if not api_key:
-                    logger.error("GOOGLE_API_KEY not found in environment variables")
-                    return json.dumps({"error": "GOOGLE_API_KEY not configured. Please set the environment variable."})
-                client = genai.Client(api_key=api_key)
-                logger.info("Using Google AI API with Gemini 3.0 Pro for portfolio analysis")
+_PORTFOLIO_MODEL = "gemini-3-pro-preview"
+# Validated recommendations share the LLM response cache, but are only reused for 15 minutes
+# since they are tied to market data fetched for that run
+_RECOMMENDATION_CACHE_TTL_SECONDS = 900
 
-            # Expert system prompt for portfolio recommendations
-            system_prompt = f"""You are an expert portfolio manager with 20+ years of experience in equity analysis and portfolio construction. Your role is to provide data-driven stock allocation recommendations with specific buy/sell/hold decisions and INTELLIGENT WEIGHTED ALLOCATION.
+# Expert system prompt for portfolio recommendations; {investment_amount} is filled in per request
+_PORTFOLIO_SYSTEM_PROMPT_TEMPLATE = """You are an expert portfolio manager with 20+ years of experience in equity analysis and portfolio construction. Your role is to provide data-driven stock allocation recommendations with specific buy/sell/hold decisions and INTELLIGENT WEIGHTED ALLOCATION.
 
 ANALYTICAL FRAMEWORK:
 1. Fundamental Analysis: Evaluate valuation metrics (P/E, P/B, PEG ratio), financial health (debt ratios, cash flow), growth metrics (revenue/earnings growth), and profitability margins
@@ -390,7 +420,7 @@ When recommending SELL, you MUST specify how many shares to sell:
    - Suggest user expand stock universe or adjust criteria
 
 PORTFOLIO CONSTRAINTS:
-- Total investment budget: ${self.investment_amount}
+- Total investment budget: ${investment_amount}
 - Maximum single stock allocation: 25% of total budget
 - Minimum single stock allocation: 5% of total budget (to ensure meaningful positions)
 - Ensure sector diversification: No more than 40% in any single sector
@@ -437,7 +467,7 @@ Example INCORRECT (will be rejected):
 ALLOCATION RULES (** CRITICAL - MUST FOLLOW **):
 1. ⚠️ NEVER EVER allocate $0 to a BUY recommendation - minimum is 5% of total budget
 2. ⚠️ If a stock CANNOT be allocated due to ANY constraint (sector limits, budget, etc.), mark it as HOLD, NOT BUY
-3. Total BUY allocations MUST sum exactly to ${self.investment_amount}
+3. Total BUY allocations MUST sum exactly to ${investment_amount}
 4. If fewer BUY opportunities, increase allocation to higher conviction stocks (up to 25% max)
 5. Distribute remaining budget across BUY recommendations proportionally by conviction
 6. For HOLD and SELL: investment_amount is always "$0"
@@ -499,14 +529,16 @@ CRITICAL RULES:
 - BUY means money is allocated, HOLD means good stock but constrained, SELL means sell the stock
 - ALL SELL recommendations MUST include shares_to_sell field (either "ALL" or "PARTIAL: X shares")
 - Always assign conviction_level to BUY recommendations (HIGH/MEDIUM/LOW)
-- If there is not enough stocks to buy and reach the full ${self.investment_amount} then its okay to invest less than ${self.investment_amount}
-- Ensure total BUY allocations sum does not exceed ${self.investment_amount}
+- If there is not enough stocks to buy and reach the full ${investment_amount} then its okay to invest less than ${investment_amount}
+- Ensure total BUY allocations sum does not exceed ${investment_amount}
 - Use weighted allocation based on conviction, NOT equal distribution
 - Reference specific metrics that justify the conviction level and allocation
 - For SELL recommendations, clearly explain WHY selling ALL vs PARTIAL shares
 - IMPORTANT: If the request includes specific DIVERSIFICATION REQUIREMENTS or INVESTMENT PATTERN preferences, prioritize following those instructions
 - If user wants to DIVERSIFY: Focus heavily on sector diversification and risk minimization, potentially recommending lower allocation percentages to existing concentrated sectors
 - If user wants to MAINTAIN EXISTING PATTERN: Analyze and replicate the sector distribution from their existing portfolio
+- Use the CURRENT HOLDINGS section of the request to see how many shares the user owns of each existing stock; weigh share counts in concentration analysis and reference them in every SELL recommendation
+- Be concise: no preamble, only the JSON object
 
 VALIDATION CHECKLIST (Before returning JSON):
 ✓ All BUY recommendations have investment_amount > $0 (minimum 5% of budget)?
@@ -514,16 +546,343 @@ VALIDATION CHECKLIST (Before returning JSON):
 ✓ All SELL recommendations have share counts provided in SHARE COUNTS section?
 ✓ All SELL recommendations include shares_to_sell field (either "ALL" or "PARTIAL: X shares")?
 ✓ Stocks needing SELL but without share counts are marked as HOLD with explanation?
-✓ Total of all BUY investment amounts = ${self.investment_amount}?
+✓ Total of all BUY investment amounts = ${investment_amount}?
 ✓ No single stock allocation > 25% of budget?
 ✓ All JSON fields properly formatted with correct types?"""
 
+
+@lru_cache(maxsize=32)
+def _portfolio_generation_config(investment_amount: str) -> GenerateContentConfig:
+    """Returns the recommendation request config for a budget, reusing it for repeated amounts."""
+    return GenerateContentConfig(
+        system_instruction=[_PORTFOLIO_SYSTEM_PROMPT_TEMPLATE.format(investment_amount=investment_amount)],
+        temperature=0.3,  # Low temperature for consistent, reliable recommendations
+    )
+
+
+# Layout of the delegation request built by the host agent's analyze_all_stocks
+_DELEGATION_EXISTING_RE = re.compile(r"^[ \t]*- Existing Portfolio Stocks:[ \t]*(.*)$", re.MULTILINE)
+_DELEGATION_NEW_RE = re.compile(r"^[ \t]*- New Stocks to Consider:[ \t]*(.*)$", re.MULTILINE)
+_DELEGATION_FIELD_RE = re.compile(r"\*\*(USER ID|SESSION ID|INVESTMENT AMOUNT|RECEIVER EMAIL ID):\*\*[ \t]*\n[ \t]*(.*)")
+_DELEGATION_SHARES_HEADER = "**SHARE COUNTS (for SELL recommendations):**"
+_DELEGATION_SHARE_LINE_RE = re.compile(r"^[ \t]*- ([A-Z0-9.\-]+): ([\d.]+) shares[ \t]*$", re.MULTILINE)
+_TICKER_RE = re.compile(r"[A-Z][A-Z0-9.\-]{0,14}")
+
+
+def _parse_ticker_list(text: str) -> Optional[List[str]]:
+    """Parses a comma-separated ticker list without duplicates; None if any entry is not a ticker symbol (e.g. a company name)."""
+    text = text.strip()
+    if not text or text.upper() == "NONE":
+        return []
+    # Strip each entry once and drop repeats (keeping order) so a duplicated ticker is not fetched twice
+    tickers = list(dict.fromkeys(t for entry in text.split(',') if (t := entry.strip())))
+    if not all(_TICKER_RE.fullmatch(t) for t in tickers):
+        return None
+    return tickers
+
+
+# save_portfolio_analysis and extract_stocks_from_analysis_request both parse the same request, and agent
+# retries replay it, so parses are memoized by request text
+@lru_cache(maxsize=256)
+def _parse_delegation_request(text: str) -> Optional[Dict]:
+    """
+    Parses a structured delegation request from the host agent without calling an LLM.
+
+    The result is shared between callers, so it must not be mutated.
+
+    Args:
+        text: The analysis request
+
+    Returns:
+        Dict with existing_stocks, new_stocks, share_counts, investment_amount, email_id, user_id and
+        session_id, or None if the request is free-form and needs LLM extraction
+    """
+    existing_match = _DELEGATION_EXISTING_RE.search(text)
+    new_match = _DELEGATION_NEW_RE.search(text)
+    if not existing_match or not new_match:
+        return None
+
+    existing_stocks = _parse_ticker_list(existing_match.group(1))
+    new_stocks = _parse_ticker_list(new_match.group(1))
+    if existing_stocks is None or new_stocks is None:
+        return None
+
+    fields = {label: value.strip() for label, value in _DELEGATION_FIELD_RE.findall(text)}
+
+    investment_amount = "0"
+    amount_text = fields.get("INVESTMENT AMOUNT", "").replace("$", "").replace(",", "")
+    if amount_text:
+        try:
+            amount = float(amount_text)
+        except ValueError:
+            return None
+        investment_amount = str(int(amount)) if amount.is_integer() else str(amount)
+
+    email_id = fields.get("RECEIVER EMAIL ID", "")
+    if not email_id or email_id == "Not specified":
+        email_id = "not_found"
+
+    share_counts = {}
+    shares_start = text.find(_DELEGATION_SHARES_HEADER)
+    if shares_start >= 0:
+        for ticker, count in _DELEGATION_SHARE_LINE_RE.findall(text, shares_start):
+            try:
+                share_counts[ticker] = float(count)
+            except ValueError:
+                logger.warning(f"Could not parse share count for {ticker}: {count}")
+
+    return {
+        "existing_stocks": existing_stocks,
+        "new_stocks": new_stocks,
+        "share_counts": share_counts,
+        "investment_amount": investment_amount,
+        "email_id": email_id,
+        "user_id": fields.get("USER ID") or "not_found",
+        "session_id": fields.get("SESSION ID") or "not_found",
+    }
+
+
+def _format_analysis_stats(analyzed_count: int, failed_count: int) -> str:
+    """Returns the one-line stock analysis statistics shared by the flow log and its summary."""
+    total = analyzed_count + failed_count
+    success_rate = analyzed_count / total * 100 if total else 0.0
+    return f"{analyzed_count} of {total} stocks analyzed ({success_rate:.0f}% success, {failed_count} failed)"
+
+
+# Instruction for the ADK agent; all the real work happens in execute_programmatic_flow
+_AGENT_INSTRUCTION = """**Role:** You are a professional stock analyst using a programmatic workflow.
+
+**WORKFLOW:**
+When you receive any analysis request, you simply need to call the `execute_programmatic_flow` function with the entire analysis request as a parameter. This function will handle all the steps programmatically:
+
+Just call: execute_programmatic_flow(analysis_request)
+
+The function will return a complete summary of the analysis that was performed."""
+
+
+async def _read_response_preview(response: httpx.Response, limit: int = 512) -> str:
+    """Reads at most `limit` bytes of a streamed response body and decodes them for logging."""
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            break
+    return b"".join(chunks)[:limit].decode(response.encoding or "utf-8", errors="replace")
+
+
+class StockAnalyzerAgent:
+    """Stock analyzer agent that handles portfolio analysis and stock recommendations."""
+    
+    def __init__(self):
+        """Initialize the stock analyzer agent with instance variables and tools."""
+        # Instance variables instead of global variables
+        self.investment_amount = ""
+        self.email_id = ""
+        self.portfolio_analysis = ""
+        self.user_id = ""
+        self.session_id = ""
+        self.stock_analysis_data = {}  # Store stock analysis data in memory
+        self.stock_current_prices = {}  # Store current prices separately for easier access
+        self.stock_share_counts = {}  # Store share counts for existing stocks
+        self.existing_stocks = []  # Track existing portfolio stocks
+        self.new_stocks = []  # Track new stocks to analyze
+
+        # Resolve webhook settings once so misconfiguration surfaces at startup, not at send time
+        self._webhook_url = current_config.ACTIVEPIECES_WEBHOOK_URL
+        self._auth_header = self._build_auth_header(
+            current_config.ACTIVEPIECES_USERNAME, current_config.ACTIVEPIECES_PASSWORD
+        )
+        if not self._auth_header:
+            logger.error("Missing Activepieces authentication credentials. Set ACTIVEPIECES_USERNAME and ACTIVEPIECES_PASSWORD to enable email delivery.")
+        self._webhook_headers = self._build_webhook_headers(self._auth_header)
+        self._webhook_tasks = set()  # Strong references to in-flight background webhook posts
+        # Pooled webhook client and the event loop it was created on; see _get_webhook_client
+        self._webhook_client: Optional[httpx.AsyncClient] = None
+        self._webhook_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Initialize MCP tool
+        # Get MCP directory from config (environment-aware)
+        mcp_directory = current_config.MCP_DIRECTORY
+        logger.info(f"Using MCP directory: {mcp_directory}")
+
+        # Prepare environment variables for MCP server (no longer needs FINNHUB_API_KEY)
+        mcp_env = {**os.environ}
+        mcp_env["MCP_TIMEOUT"] = os.getenv("MCP_TIMEOUT", "30")  # Default 30 seconds
+
+        # Use current Python interpreter (dependencies are now installed in stockanalyser_agent venv)
+        # This avoids the uv run overhead and virtual environment resolution issues
+        import sys
+        server_script = os.path.join(mcp_directory, "server.py")
+        command = sys.executable  # Use the current Python interpreter
+        args = [server_script]
+
+        connection_params = StdioConnectionParams(
+            server_params=StdioServerParameters(
+                command=command,
+                args=args,
+                env=mcp_env,
+            )
+        )
+        self.stock_mcp_tool = MCPToolset(
+            connection_params=connection_params,
+        )
+        # MCP server session, spawned on first use and kept warm across analysis requests
+        self._mcp_session = None
+        self._mcp_session_lock = asyncio.Lock()
+        
+        # Create function tools with instance methods
+        self.execute_programmatic_flow_tool = FunctionTool(self.execute_programmatic_flow)
+        self.extract_stocks_from_analysis_request_tool = FunctionTool(self.extract_stocks_from_analysis_request)
+        self.get_expert_portfolio_recommendations_tool = FunctionTool(self.get_expert_portfolio_recommendations)
+        self.save_stock_analysis_to_memory_tool = FunctionTool(self.save_stock_analysis_to_memory)
+        self.save_portfolio_analysis_tool = FunctionTool(self.save_portfolio_analysis)
+        self.send_analysis_to_webhook_tool = FunctionTool(self.send_analysis_to_webhook)
+        self._adk_agent = None  # Built by create_agent on first call
+
+    async def extract_stocks_from_analysis_request(self, analysis_request: str) -> str:
+        """
+        Uses LLM to extract stock tickers from a comprehensive analysis request.
+
+        Args:
+            analysis_request (str): The comprehensive analysis request containing stock lists and investment details
+
+        Returns:
+            str: JSON string with extracted stock lists in format {"existing_stocks": [], "new_stocks": []}
+        """
+        try:
+            logger.info(f"extract_stocks_from_analysis_request called with analysis request: {analysis_request}")
+            # Validate input parameter
+            if not analysis_request or not isinstance(analysis_request, str):
+                logger.error(f"Invalid analysis_request parameter: {analysis_request}")
+                return "**Error**: analysis_request must be a non-empty string"
+            
+            # Requests delegated by the host agent list tickers and IDs in a fixed layout, so parse
+            # those directly and only fall back to the LLM for free-form text or company names
+            delegation = _parse_delegation_request(analysis_request)
+            if delegation is not None:
+                self.stock_share_counts = dict(delegation["share_counts"])
+                self.investment_amount = delegation["investment_amount"]
+                self.email_id = delegation["email_id"]
+                self.user_id = delegation["user_id"]
+                self.session_id = delegation["session_id"]
+                logger.info(f"Parsed structured delegation request without LLM: {len(delegation['existing_stocks'])} existing, {len(delegation['new_stocks'])} new stocks")
+                logger.info(f"Share counts extracted: {self.stock_share_counts}")
+                return json.dumps({
+                    "existing_stocks": delegation["existing_stocks"],
+                    "new_stocks": delegation["new_stocks"]
+                })
+
+            # Log the analysis request for debugging
+            logger.info(f"Using LLM to extract stocks from analysis request: {len(analysis_request)} characters")
+            
+            # Reuse the shared client (Vertex AI or API key)
+            client = _get_genai_client()
+            if client is None:
+                logger.error("No GOOGLE_API_KEY found for stock extraction")
+                return "**Error**: Google API key not configured for stock extraction"
+            
+
+
+            # Generate stock extraction using LLM with retry logic (repeated requests hit the cache)
+            logger.info("Generating stock extraction using LLM")
+            response_text = await _generate_extraction_text(
+                client, analysis_request, _STOCK_EXTRACTION_PROMPT, "stock extraction", _STOCK_EXTRACTION_CONFIG
+            )
+
+            logger.info("Received LLM response for stock extraction")
+
+            existing_stocks = []
+            new_stocks = []
+            self.stock_share_counts = {}  # Reset share counts
+
+            if response_text:
+                # Parse the LLM response
+                response_text = response_text.strip()
+                logger.info(f"LLM stock extraction response: {response_text}")
+
+                # The response is schema-constrained JSON, so no line parsing is needed
+                data = json.loads(response_text)
+                existing_stocks = [t.strip().upper() for t in data.get("existing_stocks", []) if t.strip()]
+                new_stocks = [t.strip().upper() for t in data.get("new_stocks", []) if t.strip()]
+                for entry in data.get("share_counts", []):
+                    ticker = str(entry.get("ticker", "")).strip().upper()
+                    try:
+                        self.stock_share_counts[ticker] = float(entry.get("shares"))
+                    except (TypeError, ValueError):
+                        logger.warning(f"Could not parse share count for {ticker}: {entry.get('shares')}")
+
+                for field in ("investment_amount", "email_id", "user_id", "session_id"):
+                    if data.get(field):
+                        setattr(self, field, str(data[field]).strip())
+
+            else:
+                logger.error("No response from LLM for stock extraction")
+                return "**Error**: Could not extract stocks using LLM. Please try again."
+            
+            # Create JSON result
+            result = {
+                "existing_stocks": existing_stocks,
+                "new_stocks": new_stocks
+            }
+
+            logger.info(f"LLM-powered stock extraction complete: {len(existing_stocks)} existing, {len(new_stocks)} new stocks")
+            logger.info(f"Share counts extracted: {self.stock_share_counts}")
+            logger.info(f"Investment amount: {self.investment_amount}")
+            logger.info(f"Email id: {self.email_id}")
+            logger.info(f"User ID: {self.user_id}")
+            logger.info(f"Session ID: {self.session_id}")
+
+            return json.dumps(result)
+            
+        except Exception as e:
+            logger.error(f"Error in LLM stock extraction: {str(e)}")
+            return f"Error extracting stocks from analysis request: {e}"
+
+    async def get_expert_portfolio_recommendations(self, analysis_request: str = "") -> str:
+        """
+        Analyzes portfolio data from memory and provides comprehensive investment recommendations.
+        Reads both portfolio analysis and individual stock data to make buy/sell/hold decisions.
+        Uses Google's Gemini 3.0 Pro model for analysis.
+
+        Args:
+            analysis_request: Original portfolio analysis request containing current holdings information
+
+        Returns:
+            JSON string with comprehensive portfolio analysis with specific investment recommendations and amounts
+        """
+        try:
+            logger.info(f"get_expert_portfolio_recommendations called with investment amount: ${self.investment_amount}")
+
+            if not self.stock_analysis_data:
+                logger.error("No stock analysis data available in memory")
+                return json.dumps({"error": "No stock analysis data available. Please ensure stocks have been analyzed first."})
+
+            # Build text content from in-memory data
+            text_content_parts = []
+            for ticker, data in self.stock_analysis_data.items():
+                text_content_parts.append(f"Ticker: {ticker} (as of {data['timestamp']})\n{data['data']}")
+
+            text_content = "\n\n".join(text_content_parts)
+
+            logger.info(f"Successfully loaded portfolio data from memory")
+            logger.info(f"Found text content with {len(text_content)} characters for {len(self.stock_analysis_data)} stocks")
+
+            # Reuse the shared Gemini client
+            client = _get_genai_client()
+            if client is None:
+                logger.error("GOOGLE_API_KEY not found in environment variables")
+                return json.dumps({"error": "GOOGLE_API_KEY not configured. Please set the environment variable."})
+
+            # Prompt and config depend only on the budget, so they are rendered once per distinct amount
+            generation_config = _portfolio_generation_config(str(self.investment_amount))
+
             # Format share counts for LLM
-            share_counts_text = ""
             if self.stock_share_counts:
-                share_counts_text = "CURRENT HOLDINGS (Share Counts):\n"
-                for ticker, shares in self.stock_share_counts.items():
-                    share_counts_text += f"- {ticker}: {shares} shares\n"
+                share_counts_text = "CURRENT HOLDINGS (Share Counts):\n" + "".join(
+                    f"- {ticker}: {shares} shares\n" for ticker, shares in self.stock_share_counts.items()
+                )
             else:
                 share_counts_text = "CURRENT HOLDINGS (Share Counts):\nNo share count information available. SELL recommendations cannot be made without this information.\n"
 
@@ -541,18 +900,16 @@ STOCK ANALYSIS DATA:
 {text_content}
 """
 
-            # Create user prompt
-            user_prompt = f"""Please analyze this complete investment portfolio and provide specific recommendations:
-
-            {portfolio_summary}
-
-            CRITICAL INSTRUCTIONS:
-            1. Use the CURRENT HOLDINGS section above to see how many shares the user owns of each existing stock
-            2. For SELL recommendations, you MUST reference the share count from CURRENT HOLDINGS
-            3. Portfolio concentration analysis should consider the number of shares owned
-            4. If share counts are not available, you CANNOT make SELL recommendations (use HOLD instead)
+            # User prompt carries only the dynamic data; all instructions live in the system prompt
+            user_prompt = portfolio_summary
 
-            Provide actionable investment decisions with exact dollar amounts for each BUY recommendation, ensuring the total does not exceed ${self.investment_amount}."""
+            # The user prompt holds the budget, holdings, request and every stock's data, so an identical
+            # prompt (e.g. the ADK agent re-invoking this tool) reuses the validated result
+            cache_key = _llm_cache_key(_PORTFOLIO_MODEL, user_prompt)
+            cached = _get_cached_llm_entry(cache_key)
+            if cached is not None and cached[0] <= _RECOMMENDATION_CACHE_TTL_SECONDS:
+                logger.info("Using cached portfolio recommendations for identical analysis data")
+                return cached[1]
 
             # Generate portfolio recommendations using LLM
             logger.info(f"Generating comprehensive portfolio recommendations")
@@ -566,19 +923,25 @@ STOCK ANALYSIS DATA:
                     if attempt > 0:
                         delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
                         logger.info(f"Retrying portfolio analysis after {delay:.2f}s delay (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(delay)
-
-                    # Call Gemini API with gemini-3-pro-preview model
-                    response = client.models.generate_content(
-                        model="gemini-3-pro-preview",
+                        await asyncio.sleep(delay)
+
+                    # Call Gemini API with gemini-3-pro-preview model, streaming chunks into one buffer
+                    # so the first token arrives early and long generations keep the connection active
+                    request_start = time.monotonic()
+                    first_chunk_at = None
+                    buf = io.StringIO()
+                    async for chunk in await client.aio.models.generate_content_stream(
+                        model=_PORTFOLIO_MODEL,
                         contents=user_prompt,
-                        config=GenerateContentConfig(
-                            system_instruction=[system_prompt],
-                            temperature=0.3,  # Low temperature for consistent, reliable recommendations
-                        )
-                    )
+                        config=generation_config,
+                    ):
+                        if chunk.text:
+                            if first_chunk_at is None:
+                                first_chunk_at = time.monotonic()
+                                logger.info(f"First portfolio recommendation chunk after {first_chunk_at - request_start:.2f}s")
+                            buf.write(chunk.text)
 
-                    response_text = response.text if response and response.text else None
+                    response_text = buf.getvalue() or None
 
                     if response_text:
                         # Log successful generation
@@ -596,7 +959,7 @@ STOCK ANALYSIS DATA:
 
                         # Validate JSON
                         try:
-                            parsed_json = json.loads(cleaned_text)
+                            parsed_json = orjson.loads(cleaned_text)
 
                             # Validate required fields
                             required_fields = ["allocation_breakdown", "individual_stock_recommendations", "risk_warnings"]
@@ -748,7 +1111,9 @@ STOCK ANALYSIS DATA:
 
                             # Return the validated JSON string
                             logger.info(f"Successfully validated JSON response")
-                            return json.dumps(parsed_json)
+                            validated_text = orjson.dumps(parsed_json).decode()
+                            _put_cached_llm_text(cache_key, validated_text)
+                            return validated_text
 
                         except json.JSONDecodeError as json_err:
                             logger.warning(f"Invalid JSON response from LLM (attempt {attempt + 1}): {str(json_err)}")
@@ -821,15 +1186,16 @@ STOCK ANALYSIS DATA:
                 "data": analysis_data
             }
 
-            logger.info(f"Successfully saved analysis for {ticker} to memory")
-            return f"Successfully saved analysis for {ticker} to memory"
+            result_msg = f"Successfully saved analysis for {ticker} to memory"
+            logger.info(result_msg)
+            return result_msg
 
         except Exception as e:
             error_msg = f"Error saving analysis for {ticker}: {e}"
             logger.error(error_msg)
             return error_msg
 
-    def save_portfolio_analysis(self, portfolio_analysis: str) -> str:
+    async def save_portfolio_analysis(self, portfolio_analysis: str) -> str:
         """
         Save portfolio analysis data to database and extract investment_amount and email_id.
 
@@ -849,96 +1215,38 @@ STOCK ANALYSIS DATA:
                 logger.warning("Portfolio analysis is empty, skipping save")
                 return json.dumps({"error": "Portfolio analysis is empty, nothing to save"})
 
-            # Extract investment amount and email using LLM (similar to stock extraction)
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-                client = genai.Client(vertexai=True)
-                logger.info("Using Vertex AI for investment details extraction")
-            elif api_key:
-                client = genai.Client(api_key=api_key)
-                logger.info("Using Google GenAI API for investment details extraction")
-            else:
-                client = genai.Client()
-                logger.info("Using default GenAI client for investment details extraction")
-
-            # System prompt for extracting investment details
-            system_prompt = """Extract the investment amount, email ID, user ID, and session ID from the analysis request.
-
-            Rules:
-            - Look for investment amount patterns like "$1000", "1000$", "invest 1000", etc.
-            - Look for email patterns like "email@domain.com", "send to user@email.com", etc.
-            - Look for user ID patterns like "USER ID: user123", "user_id: abc", etc.
-            - Look for session ID patterns like "SESSION ID: sess456", "session_id: xyz", etc.
-            - Extract only the numeric value for investment amount (remove $ symbols)
-            - Extract only the email address, user ID, and session ID
-
-            Respond with ONLY these four lines in this exact format:
-            INVESTMENT_AMOUNT: 1000
-            EMAIL_ID: user@example.com
-            USER_ID: user123
-            SESSION_ID: sess456
-
-            If not found, write: INVESTMENT_AMOUNT: 0 or EMAIL_ID: not_found or USER_ID: not_found or SESSION_ID: not_found"""
-
-            # Retry logic for Google AI API calls
-            max_retries = 3
-            base_delay = 2.0
-            response = None
-
-            for attempt in range(max_retries):
-                try:
-                    if attempt > 0:
-                        import random
-                        delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                        logger.info(f"Retrying investment details extraction after {delay:.2f}s delay (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(delay)
-
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        contents=portfolio_analysis,
-                        config=GenerateContentConfig(
-                            system_instruction=[system_prompt]
-                        )
-                    )
-
-                    # If we get here, the call was successful
-                    logger.info(f"Successfully extracted investment details (attempt {attempt + 1})")
-                    break
-
-                except Exception as e:
-                    error_message = str(e)
-                    is_api_error = any(code in error_message for code in ["500", "503", "INTERNAL", "UNAVAILABLE"])
-
-                    if attempt == max_retries - 1:
-                        # Last attempt failed, re-raise the exception
-                        logger.error(f"Failed to extract investment details after {max_retries} attempts: {e}")
-                        raise
-
-                    if is_api_error:
-                        logger.warning(f"Google AI API error on attempt {attempt + 1}: {e}")
-                    else:
-                        logger.warning(f"Non-API error on attempt {attempt + 1}: {e}")
-                        # For non-API errors, fail immediately
-                        raise
-
             investment_amount = "0"
             email_id = "not_found"
             user_id = "not_found"
             session_id = "not_found"
 
-            if response and response.text:
-                response_text = response.text.strip()
-                lines = response_text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith("INVESTMENT_AMOUNT:"):
-                        investment_amount = line.replace("INVESTMENT_AMOUNT:", "").strip()
-                    elif line.startswith("EMAIL_ID:"):
-                        email_id = line.replace("EMAIL_ID:", "").strip()
-                    elif line.startswith("USER_ID:"):
-                        user_id = line.replace("USER_ID:", "").strip()
-                    elif line.startswith("SESSION_ID:"):
-                        session_id = line.replace("SESSION_ID:", "").strip()
+            delegation = _parse_delegation_request(portfolio_analysis)
+            if delegation is not None:
+                # Structured request from the host agent - no LLM round-trip needed
+                logger.info("Parsed investment details from structured delegation request without LLM")
+                investment_amount = delegation["investment_amount"]
+                email_id = delegation["email_id"]
+                user_id = delegation["user_id"]
+                session_id = delegation["session_id"]
+            else:
+                # Extract investment amount and email using LLM (similar to stock extraction)
+                client = _get_genai_client()
+                if client is None:
+                    client = genai.Client(http_options=_GENAI_HTTP_OPTIONS)
+                    logger.info("Using default GenAI client for investment details extraction")
+
+                # Same prompt and schema as stock extraction, so a concurrent extract_stocks_from_analysis_request
+                # call on this request shares the one Gemini round-trip (repeated requests hit the cache)
+                response_text = await _generate_extraction_text(
+                    client, portfolio_analysis, _STOCK_EXTRACTION_PROMPT, "investment details extraction", _STOCK_EXTRACTION_CONFIG
+                )
+
+                if response_text:
+                    details = json.loads(response_text)
+                    investment_amount = str(details.get("investment_amount") or investment_amount)
+                    email_id = details.get("email_id") or email_id
+                    user_id = details.get("user_id") or user_id
+                    session_id = details.get("session_id") or session_id
 
             # Store in instance variables for later use
             self.investment_amount = investment_amount
@@ -960,10 +1268,13 @@ STOCK ANALYSIS DATA:
                     "warning": "Portfolio analysis not saved to database due to missing user_id or session_id"
                 })
 
-            # Save to database
+            # Save to database (imported here so SQLAlchemy and the engine load only when a save happens)
+            from database import get_db, save_portfolio_analysis
             db = next(get_db())
             try:
-                saved_analysis = save_portfolio_analysis(
+                # The DB driver is blocking, so keep it off the event loop
+                saved_analysis = await asyncio.to_thread(
+                    save_portfolio_analysis,
                     db=db,
                     session_id=self.session_id,
                     user_id=self.user_id,
@@ -992,66 +1303,44 @@ STOCK ANALYSIS DATA:
             logger.error(error_msg)
             return json.dumps({"error": error_msg})
 
-    def convert_portfolio_analysis_to_html(self, text: str) -> str:
+    def convert_portfolio_analysis_to_html(self, text: str, report_date: Optional[str] = None) -> str:
         """
         Converts portfolio analysis JSON to HTML email-friendly format.
         Parses JSON format and applies proper HTML styling with color coding.
 
         Args:
             text: The portfolio analysis in JSON format
+            report_date: Optional date appended to the ALLOCATION BREAKDOWN heading
 
         Returns:
             HTML formatted string suitable for email body
         """
         try:
-            # Parse JSON input
-            data = json.loads(text)
+            # Parse JSON input (orjson.JSONDecodeError subclasses json.JSONDecodeError, so the handler below still applies)
+            data = orjson.loads(text)
 
-            html_parts = []
+            buf = io.StringIO()
+            w = buf.write
 
-            # Start HTML with basic styling
-            html_parts.append('''<html>
-<head>
-<style>
-body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 900px; margin: 0 auto; padding: 20px; background-color: #f5f5f5; }
-h1 { color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px; font-size: 24px; margin-top: 25px; }
-h2 { color: #34495e; margin-top: 30px; font-size: 20px; }
-h3 { color: #7f8c8d; margin-top: 20px; font-size: 16px; font-weight: bold; }
-.allocation { background-color: #ecf0f1; padding: 15px; border-radius: 5px; margin: 15px 0; }
-.stock-card { background-color: #ffffff; border-left: 6px solid #3498db; padding: 15px 20px; margin: 15px 0; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
-.stock-card p { margin: 8px 0; line-height: 1.5; }
-.buy { border-left-color: #27ae60; background-color: #f0fcf4; }
-.hold { border-left-color: #f39c12; background-color: #fef9f0; }
-.sell { border-left-color: #e74c3c; background-color: #fef5f5; }
-.ticker { font-weight: bold; font-size: 18px; color: #2c3e50; }
-.recommendation { font-weight: bold; padding: 5px 12px; border-radius: 4px; display: inline-block; font-size: 14px; letter-spacing: 0.5px; }
-.rec-buy { background-color: #27ae60; color: white; }
-.rec-hold { background-color: #f39c12; color: white; }
-.rec-sell { background-color: #e74c3c; color: white; }
-ul { margin: 10px 0; }
-li { margin: 8px 0; }
-.warning { background-color: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 15px 0; }
-strong { color: #2c3e50; }
-</style>
-</head>
-<body>''')
+            # Start HTML with the shared head and styling
+            w(_REPORT_HTML_HEAD)
 
             # Add Allocation Breakdown section
             if 'allocation_breakdown' in data and data['allocation_breakdown']:
-                html_parts.append('<h1>ALLOCATION BREAKDOWN</h1>')
-                html_parts.append('<ul class="allocation">')
+                w(f'<h1>ALLOCATION BREAKDOWN - {report_date}</h1>' if report_date else '<h1>ALLOCATION BREAKDOWN</h1>')
+                w('<ul class="allocation">')
 
                 for allocation in data['allocation_breakdown']:
                     ticker = allocation.get('ticker', 'N/A')
                     percentage = allocation.get('percentage', 'N/A')
                     investment_amount = allocation.get('investment_amount', 'N/A')
-                    html_parts.append(f'<li><strong>{ticker}:</strong> {percentage} - {investment_amount}</li>')
+                    w(f'<li><strong>{ticker}:</strong> {percentage} - {investment_amount}</li>')
 
-                html_parts.append('</ul>')
+                w('</ul>')
 
             # Add Individual Stock Recommendations section
             if 'individual_stock_recommendations' in data and data['individual_stock_recommendations']:
-                html_parts.append('<h1>INDIVIDUAL STOCK RECOMMENDATIONS</h1>')
+                w('<h1>INDIVIDUAL STOCK RECOMMENDATIONS</h1>')
 
                 for stock in data['individual_stock_recommendations']:
                     ticker = stock.get('ticker', 'N/A')
@@ -1070,33 +1359,33 @@ strong { color: #2c3e50; }
                         rec_type = 'sell'
                         rec_class = 'rec-sell'
 
-                    html_parts.append(f'<div class="stock-card {rec_type}">')
-                    html_parts.append(f'<span class="ticker">{ticker}</span> - <span class="recommendation {rec_class}">{recommendation}</span>')
+                    w(f'<div class="stock-card {rec_type}">')
+                    w(f'<span class="ticker">{ticker}</span> - <span class="recommendation {rec_class}">{recommendation}</span>')
 
                     if recommendation == 'BUY':
-                        html_parts.append(f'<p><strong>Investment Amount: {investment_amount}</strong></p>')
+                        w(f'<p><strong>Investment Amount: {investment_amount}</strong></p>')
                     elif recommendation == 'SELL':
                         shares_to_sell = stock.get('shares_to_sell', 'Not specified')
-                        html_parts.append(f'<p><strong>⚠️ Action Required: Sell {shares_to_sell}</strong></p>')
+                        w(f'<p><strong>⚠️ Action Required: Sell {shares_to_sell}</strong></p>')
 
-                    html_parts.append(f'<p><strong>Key Metrics:</strong> {key_metrics}</p>')
-                    html_parts.append(f'<p><strong>Reasoning:</strong> {reasoning}</p>')
-                    html_parts.append('</div>')
+                    w(f'<p><strong>Key Metrics:</strong> {key_metrics}</p>')
+                    w(f'<p><strong>Reasoning:</strong> {reasoning}</p>')
+                    w('</div>')
 
             # Add Risk Warnings section
             if 'risk_warnings' in data and data['risk_warnings']:
-                html_parts.append('<h1>RISK WARNINGS</h1>')
-                html_parts.append('<ul>')
+                w('<h1>RISK WARNINGS</h1>')
+                w('<ul>')
 
                 for warning in data['risk_warnings']:
-                    html_parts.append(f'<li>{warning}</li>')
+                    w(f'<li>{warning}</li>')
 
-                html_parts.append('</ul>')
+                w('</ul>')
 
             # Close HTML
-            html_parts.append('</body></html>')
+            w('</body></html>')
 
-            return ''.join(html_parts)
+            return buf.getvalue()
 
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON in convert_portfolio_analysis_to_html: {e}")
@@ -1135,14 +1424,31 @@ body {{ font-family: Arial, sans-serif; padding: 20px; }}
 </body>
 </html>'''
 
-    def send_analysis_to_webhook(self, analysis_response: str, email_to: str, webhook_url: Optional[str] = None, username: Optional[str] = None, password: Optional[str] = None) -> str:
+    @staticmethod
+    def _build_auth_header(username: Optional[str], password: Optional[str]) -> Optional[str]:
+        """Returns the Basic auth header value for the given credentials, or None if either is missing."""
+        if not username or not password:
+            return None
+        return "Basic " + base64.b64encode(f"{username}:{password}".encode()).decode()
+
+    @staticmethod
+    def _build_webhook_headers(auth_header: Optional[str]) -> Optional[Dict[str, str]]:
+        """Returns the webhook request headers for the given auth header value, or None if it is missing."""
+        if not auth_header:
+            return None
+        return {
+            "Authorization": auth_header,
+            "Content-Type": "application/json"
+        }
+
+    async def send_analysis_to_webhook(self, analysis_response: str, email_to: str, webhook_url: Optional[str] = None, username: Optional[str] = None, password: Optional[str] = None) -> str:
         """
         Securely sends analysis response data to the Activepieces webhook endpoint.
         
         Args:
             analysis_response: The analysis data to send
             email_to: Email address to send the analysis to
-            webhook_url: Webhook URL (defaults to Activepieces endpoint)
+            webhook_url: Webhook URL (defaults to ACTIVEPIECES_WEBHOOK_URL or the Activepieces endpoint)
             username: Basic auth username (defaults to environment variable)
             password: Basic auth password (defaults to environment variable)
         
@@ -1151,13 +1457,18 @@ body {{ font-family: Arial, sans-serif; padding: 20px; }}
         """
         try:
             logger.info("Preparing to send analysis response to webhook endpoint")
-            # Use environment variables for sensitive data if not provided
-            webhook_url = webhook_url or "https://cloud.activepieces.com/api/v1/webhooks/a3jeiaYrX1ZqVdSAye25A"
-            username = username or os.getenv("ACTIVEPIECES_USERNAME")
-            password = password or os.getenv("ACTIVEPIECES_PASSWORD")
+            # Fall back to the settings resolved at init if not provided
+            webhook_url = webhook_url or self._webhook_url
+            if username or password:
+                headers = self._build_webhook_headers(self._build_auth_header(
+                    username or current_config.ACTIVEPIECES_USERNAME,
+                    password or current_config.ACTIVEPIECES_PASSWORD,
+                ))
+            else:
+                headers = self._webhook_headers
             
             # Validate required parameters
-            if not username or not password:
+            if not headers:
                 logger.error("Missing Activepieces authentication credentials")
                 return "Error: Missing authentication credentials. Please set ACTIVEPIECES_USERNAME and ACTIVEPIECES_PASSWORD environment variables."
             
@@ -1166,86 +1477,217 @@ body {{ font-family: Arial, sans-serif; padding: 20px; }}
                 return "Error: Analysis response cannot be empty."
             
             # Get current date for email body
-            current_date = datetime.now().strftime("%B %d, %Y")
-            
-            # Add date to the beginning of HTML content
-            response_with_date = analysis_response.replace(
-                'ALLOCATION BREAKDOWN',
-                f'ALLOCATION BREAKDOWN - {current_date}'
-            )
-            
-            # Prepare the request data - include both plain text and HTML versions
-            payload = {
-                "analysis_response": response_with_date,  # Add HTML version for email with date
-                "email_to": email_to
-            }
-            
-            # Create basic auth header - exactly like your working curl
-            credentials = f"{username}:{password}"
-            encoded_credentials = base64.b64encode(credentials.encode()).decode()
-            headers = {
-                "Authorization": f"Basic {encoded_credentials}",
-                "Content-Type": "application/json"
-                # Removed User-Agent to match your curl exactly
-            }
+            current_date = datetime.now().strftime(_REPORT_DATE_FORMAT)
             
             logger.info(f"Sending analysis data to webhook: {webhook_url}")
-            logger.info(f"Payload: {payload}")
-            html_content = self.convert_portfolio_analysis_to_html(response_with_date)
+            # Date is added to the ALLOCATION BREAKDOWN heading while the HTML is built
+            html_content = self.convert_portfolio_analysis_to_html(analysis_response, report_date=current_date)
             html_payload = {
                 "analysis_response": html_content,
                 "email_to": email_to
             }
-            logger.info(f"html_payload: {html_payload}")
-            logger.info(f"Headers: {json.dumps({k: v for k, v in headers.items() if k != 'Authorization'}, indent=2)}")
-            logger.info(f"Auth: Basic {encoded_credentials[:10]}...")
+            logger.debug("HTML payload size: %d characters, prefix: %.100s", len(html_content), html_content)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Headers: %s", {k: v for k, v in headers.items() if k != 'Authorization'})
             
             # Make the POST request - exactly like your curl
-            response = requests.post(
-                webhook_url,
-                json=html_payload,
-                headers=headers,
-                timeout=30
-            )
+            body = orjson.dumps(html_payload)
+            if current_config.ACTIVEPIECES_GZIP_PAYLOAD and len(body) > _GZIP_MIN_BYTES:
+                import gzip
+                body = gzip.compress(body, compresslevel=1)
+                headers = {**headers, "Content-Encoding": "gzip"}
+            logger.info(f"Webhook body size: {len(body)} bytes")
+
+            # Stream the response so only a bounded prefix of the body is ever read;
+            # gateway errors are retried on the same pooled connection with backoff
+            for attempt in range(_WEBHOOK_MAX_RETRIES + 1):
+                async with self._get_webhook_client().stream(
+                    "POST",
+                    webhook_url,
+                    content=body,
+                    headers=headers,
+                ) as response:
+                    response_text = await _read_response_preview(response)
+                if response.status_code not in _WEBHOOK_RETRY_STATUSES or attempt == _WEBHOOK_MAX_RETRIES:
+                    break
+                delay = _WEBHOOK_BACKOFF_FACTOR * (2 ** attempt)
+                logger.warning(f"Webhook returned {response.status_code}, retrying in {delay:.1f}s (attempt {attempt + 1}/{_WEBHOOK_MAX_RETRIES})")
+                await asyncio.sleep(delay)
             
-            # Log the full response for debugging
-            logger.info(f"Response status: {response.status_code}")
-            logger.info(f"Response headers: {dict(response.headers)}")
-            logger.info(f"Response text: {response.text[:500]}")
+            # Log the response for debugging; headers and body only at DEBUG level
+            logger.info("Response status: %d", response.status_code)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Response headers: %s", dict(response.headers))
+                logger.debug("Response text: %s", response_text)
             
             # Check response status
             if response.status_code == 200:
                 logger.info("Successfully sent analysis data to webhook")
-                return f"Success: Analysis data sent to webhook. Response: {response.status_code} - {response.text[:100]}..."
+                return f"Success: Analysis data sent to webhook. Response: {response.status_code} - {response_text[:100]}..."
             elif response.status_code == 401:
                 logger.error("Authentication failed - check username/password")
-                return f"Error: Authentication failed. Please verify your Activepieces credentials. Response: {response.text[:200]}"
+                return f"Error: Authentication failed. Please verify your Activepieces credentials. Response: {response_text[:200]}"
             elif response.status_code == 404:
                 logger.error("Webhook endpoint not found")
-                return f"Error: Webhook endpoint not found. Please verify the URL. Response: {response.text[:200]}"
+                return f"Error: Webhook endpoint not found. Please verify the URL. Response: {response_text[:200]}"
             elif response.status_code >= 500:
                 logger.error(f"Server error from webhook: {response.status_code}")
-                return f"Error: Server error from webhook ({response.status_code}). Response: {response.text[:200]}"
+                return f"Error: Server error from webhook ({response.status_code}). Response: {response_text[:200]}"
             else:
                 logger.warning(f"Unexpected response from webhook: {response.status_code}")
-                return f"Warning: Unexpected response from webhook ({response.status_code}): {response.text[:200]}"
+                return f"Warning: Unexpected response from webhook ({response.status_code}): {response_text[:200]}"
                 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             logger.error("Request timeout - webhook endpoint took too long to respond")
             return "Error: Request timeout. The webhook endpoint took too long to respond."
-        except requests.exceptions.SSLError:
-            logger.error("SSL certificate verification failed")
-            return "Error: SSL certificate verification failed. Please check the webhook endpoint."
-        except requests.exceptions.ConnectionError:
+        except httpx.ConnectError:
             logger.error("Connection error - unable to reach webhook endpoint")
             return "Error: Connection error. Unable to reach the webhook endpoint."
-        except requests.exceptions.RequestException as e:
+        except httpx.RequestError as e:
             logger.error(f"Request error: {str(e)}")
             return f"Error: Request failed - {str(e)}"
         except Exception as e:
             logger.error(f"Unexpected error sending to webhook: {str(e)}")
             return f"Error: Unexpected error occurred - {str(e)}"
 
+    async def _get_mcp_session(self):
+        """
+        Returns the MCP server session, starting the server subprocess only on first use.
+
+        The cached session is pinged before reuse and recreated if the server has gone away,
+        so later analysis requests skip the process spawn and MCP handshake.
+
+        Returns:
+            An initialized MCP client session
+        """
+        async with self._mcp_session_lock:
+            if self._mcp_session is not None:
+                try:
+                    await self._mcp_session.send_ping()
+                    return self._mcp_session
+                except Exception as e:
+                    logger.warning(f"Cached MCP session is no longer usable, reconnecting: {e}")
+                    self._mcp_session = None
+
+            start = time.monotonic()
+            self._mcp_session = await self.stock_mcp_tool._mcp_session_manager.create_session()
+            logger.info(f"Started MCP session in {time.monotonic() - start:.2f}s")
+            return self._mcp_session
+
+    async def _analyze_stock(self, stock: str, session, semaphore: asyncio.Semaphore) -> bool:
+        """
+        Fetch MCP data for a single stock, record its current price and save the analysis to memory.
+
+        Args:
+            stock: Stock ticker symbol to analyze
+            session: MCP client session shared by all stocks in the flow
+            semaphore: Bounds how many MCP calls are in flight at once
+
+        Returns:
+            True if the MCP data was fetched and saved, False if the stock could not be analyzed
+        """
+        async with semaphore:
+            try:
+                logger.info(f"Analyzing stock: {stock}")
+
+                # Call MCP tool through the shared session
+                stock_data_result = await session.call_tool("get_stock_info", arguments={"symbol": stock})
+
+                # Extract current price immediately from MCP response
+                try:
+                    # Parse MCP result object to get actual data
+                    stock_data = None
+
+                    # MCP returns a result object with content attribute
+                    if hasattr(stock_data_result, 'content'):
+                        # Extract content from MCP result
+                        if isinstance(stock_data_result.content, list) and len(stock_data_result.content) > 0:
+                            content_item = stock_data_result.content[0]
+                            if hasattr(content_item, 'text'):
+                                # Parse the JSON text
+                                stock_data = orjson.loads(content_item.text)
+                                logger.info(f"Successfully parsed MCP data for {stock}")
+                    elif isinstance(stock_data_result, dict):
+                        # Already a dict (might happen in some environments)
+                        stock_data = stock_data_result
+                    elif isinstance(stock_data_result, str):
+                        # String response - parse as JSON
+                        stock_data = orjson.loads(stock_data_result)
+
+                    if stock_data and isinstance(stock_data, dict):
+                        stock_type = stock_data.get("stock_type", "EQUITY")
+                        current_price = None
+
+                        if stock_type == "EQUITY":
+                            # For stocks: get currentPrice from core_valuation_metrics
+                            core_valuation = stock_data.get("core_valuation_metrics", {})
+                            current_price = core_valuation.get("currentPrice")
+                            logger.info(f"Extracted EQUITY price for {stock}: {current_price}")
+                        else:  # ETF
+                            # For ETFs: get regularMarketPrice from trading_valuation
+                            trading_valuation = stock_data.get("trading_valuation", {})
+                            current_price = trading_valuation.get("regularMarketPrice")
+                            logger.info(f"Extracted ETF price for {stock}: {current_price}")
+
+                        if current_price:
+                            self.stock_current_prices[stock] = float(current_price)
+                            logger.info(f"Successfully stored entry price for {stock}: ${current_price}")
+                        else:
+                            logger.warning(f"No current price found in MCP data for {stock}. Stock type: {stock_type}")
+                    else:
+                        logger.warning(f"Could not parse MCP response to dict for {stock}. Type: {type(stock_data_result)}")
+                except json.JSONDecodeError as json_error:
+                    logger.warning(f"JSON decode error for {stock}: {json_error}")
+                except Exception as price_error:
+                    logger.warning(f"Could not extract entry price for {stock}: {price_error}")
+                    # exc_info defers formatting the traceback until a DEBUG handler actually emits it
+                    logger.debug("Full traceback for %s entry price extraction", stock, exc_info=True)
+
+                # Save stock analysis result to memory (use parsed data if available, otherwise result object)
+                # orjson's compact output keeps the stock data small when it is embedded in the LLM prompt
+                data_to_save = orjson.dumps(stock_data).decode() if stock_data else str(stock_data_result)
+                save_result = self.save_stock_analysis_to_memory(stock, data_to_save)
+                logger.info(f"Saved analysis for {stock}: {save_result}")
+                return True
+
+            except Exception as stock_error:
+                logger.error(f"Error analyzing stock {stock}: {stock_error}")
+                # Continue with other stocks even if one fails
+                error_message = f"Error analyzing {stock}: {str(stock_error)}"
+                self.save_stock_analysis_to_memory(stock, error_message)
+                return False
+
+    def _get_webhook_client(self) -> httpx.AsyncClient:
+        """
+        Returns the webhook client for the running event loop, creating it on first use.
+
+        An httpx connection pool is bound to the loop that opened its connections, so a new
+        asyncio.run() (or an in-process server restart) gets a fresh client instead of reusing
+        transports from a closed loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._webhook_client is None or self._webhook_client.is_closed or self._webhook_client_loop is not loop:
+            self._webhook_client = _new_webhook_client()
+            self._webhook_client_loop = loop
+        return self._webhook_client
+
+    async def aclose(self) -> None:
+        """Closes the webhook client's pooled connections; call on shutdown."""
+        client, self._webhook_client = self._webhook_client, None
+        self._webhook_client_loop = None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+    def _on_webhook_task_done(self, task: asyncio.Task) -> None:
+        """Logs the outcome of a background webhook post and drops the task reference."""
+        self._webhook_tasks.discard(task)
+        if task.cancelled():
+            logger.warning("Background webhook post was cancelled")
+        elif task.exception() is not None:
+            logger.error(f"Background webhook post failed: {task.exception()}")
+        else:
+            logger.info(f"Webhook result: {task.result()}")
+
     async def execute_programmatic_flow(self, analysis_request: str) -> str:
         """
         Execute the programmatic stock analysis flow.
@@ -1260,9 +1702,21 @@ body {{ font-family: Arial, sans-serif; padding: 20px; }}
             logger.info("Starting programmatic stock analysis flow")
             logger.info(f"Analysis request received from user_id: {self.user_id if hasattr(self, 'user_id') else 'unknown'}, session_id: {self.session_id if hasattr(self, 'session_id') else 'unknown'}")
 
-            # Step 1: Save portfolio analysis and extract investment details
+            # Steps 1 and 2 are independent Gemini calls on the same request, so run them
+            # concurrently on the async client instead of back to back. The MCP session for
+            # Step 3 doesn't depend on either, so it is started (or validated) alongside them.
+            # Exceptions are collected so an MCP failure surfaces at Step 3, after Steps 1 and 2
             logger.info("Step 1: Saving portfolio analysis and extracting investment details")
-            portfolio_result = self.save_portfolio_analysis(analysis_request)
+            logger.info("Step 2: Extracting stocks from analysis request")
+            portfolio_result, stocks_result, session = await asyncio.gather(
+                self.save_portfolio_analysis(analysis_request),
+                self.extract_stocks_from_analysis_request(analysis_request),
+                self._get_mcp_session(),
+                return_exceptions=True,
+            )
+            for step_result in (portfolio_result, stocks_result):
+                if isinstance(step_result, BaseException):
+                    raise step_result
             portfolio_data = json.loads(portfolio_result)
 
             if "error" in portfolio_data:
@@ -1270,15 +1724,13 @@ body {{ font-family: Arial, sans-serif; padding: 20px; }}
 
             logger.info(f"Extracted investment amount: {portfolio_data['investment_amount']}, email: {portfolio_data['email_id']}")
 
-            # Step 2: Extract stocks from analysis request
-            logger.info("Step 2: Extracting stocks from analysis request")
-            stocks_result = self.extract_stocks_from_analysis_request(analysis_request)
             stocks_data = json.loads(stocks_result)
             logger.info(f"stocks_data: {stocks_data}")
 
             existing_stocks = stocks_data.get("existing_stocks", [])
             new_stocks = stocks_data.get("new_stocks", [])
-            all_stocks = existing_stocks + new_stocks
+            # A ticker listed as both existing and new (or repeated by the LLM) is analyzed once
+            all_stocks = list(dict.fromkeys(existing_stocks + new_stocks))
 
             # Store in instance variables for validation
             self.existing_stocks = existing_stocks
@@ -1289,84 +1741,42 @@ body {{ font-family: Arial, sans-serif; padding: 20px; }}
 
             # Step 3: Analyze each stock using MCP tool
             logger.info(f"Step 3: Analyzing {len(all_stocks)} stocks")
-            for stock in all_stocks:
-                try:
-                    logger.info(f"Analyzing stock: {stock}")
-
-                    # Call MCP tool through session manager
-                    session = await self.stock_mcp_tool._mcp_session_manager.create_session()
-                    stock_data_result = await session.call_tool("get_stock_info", arguments={"symbol": stock})
-
-                    # Extract current price immediately from MCP response
-                    try:
-                        # Parse MCP result object to get actual data
-                        stock_data = None
-
-                        # MCP returns a result object with content attribute
-                        if hasattr(stock_data_result, 'content'):
-                            # Extract content from MCP result
-                            if isinstance(stock_data_result.content, list) and len(stock_data_result.content) > 0:
-                                content_item = stock_data_result.content[0]
-                                if hasattr(content_item, 'text'):
-                                    # Parse the JSON text
-                                    stock_data = json.loads(content_item.text)
-                                    logger.info(f"Successfully parsed MCP data for {stock}")
-                        elif isinstance(stock_data_result, dict):
-                            # Already a dict (might happen in some environments)
-                            stock_data = stock_data_result
-                        elif isinstance(stock_data_result, str):
-                            # String response - parse as JSON
-                            stock_data = json.loads(stock_data_result)
-
-                        if stock_data and isinstance(stock_data, dict):
-                            stock_type = stock_data.get("stock_type", "EQUITY")
-                            current_price = None
-
-                            if stock_type == "EQUITY":
-                                # For stocks: get currentPrice from core_valuation_metrics
-                                core_valuation = stock_data.get("core_valuation_metrics", {})
-                                current_price = core_valuation.get("currentPrice")
-                                logger.info(f"Extracted EQUITY price for {stock}: {current_price}")
-                            else:  # ETF
-                                # For ETFs: get regularMarketPrice from trading_valuation
-                                trading_valuation = stock_data.get("trading_valuation", {})
-                                current_price = trading_valuation.get("regularMarketPrice")
-                                logger.info(f"Extracted ETF price for {stock}: {current_price}")
-
-                            if current_price:
-                                self.stock_current_prices[stock] = float(current_price)
-                                logger.info(f"Successfully stored entry price for {stock}: ${current_price}")
-                            else:
-                                logger.warning(f"No current price found in MCP data for {stock}. Stock type: {stock_type}")
-                        else:
-                            logger.warning(f"Could not parse MCP response to dict for {stock}. Type: {type(stock_data_result)}")
-                    except json.JSONDecodeError as json_error:
-                        logger.warning(f"JSON decode error for {stock}: {json_error}")
-                    except Exception as price_error:
-                        logger.warning(f"Could not extract entry price for {stock}: {price_error}")
-                        import traceback
-                        logger.debug(f"Full traceback: {traceback.format_exc()}")
-
-                    # Save stock analysis result to memory (use parsed data if available, otherwise result object)
-                    data_to_save = json.dumps(stock_data) if stock_data else str(stock_data_result)
-                    save_result = self.save_stock_analysis_to_memory(stock, data_to_save)
-                    logger.info(f"Saved analysis for {stock}: {save_result}")
-
-                except Exception as stock_error:
-                    logger.error(f"Error analyzing stock {stock}: {stock_error}")
-                    # Continue with other stocks even if one fails
-                    error_message = f"Error analyzing {stock}: {str(stock_error)}"
-                    self.save_stock_analysis_to_memory(stock, error_message)
+            if isinstance(session, BaseException):
+                raise session
+            # One MCP session serves every stock; the client multiplexes concurrent requests.
+            # Outcomes are tallied as each stock finishes rather than after the slowest one
+            semaphore = asyncio.Semaphore(current_config.MCP_MAX_CONCURRENCY)
+            analyzed_count = 0
+            failed_count = 0
+            for completed in asyncio.as_completed([self._analyze_stock(stock, session, semaphore) for stock in all_stocks]):
+                if await completed:
+                    analyzed_count += 1
+                else:
+                    failed_count += 1
+                logger.info(f"Step 3 progress: {analyzed_count + failed_count}/{len(all_stocks)} stocks done")
+            analysis_stats = _format_analysis_stats(analyzed_count, failed_count)
+            logger.info(f"Step 3 complete: {analysis_stats}")
 
             # Step 4: Get expert portfolio recommendations
             logger.info("Step 4: Generating expert portfolio recommendations")
-            recommendations = self.get_expert_portfolio_recommendations(analysis_request)
+            recommendations = await self.get_expert_portfolio_recommendations(analysis_request)
 
-            # Step 5: Save recommendations to database
-            logger.info("Step 5: Saving recommendations to database")
+            # Step 5: Send analysis to webhook
+            # The email only needs the recommendation text, so start delivery now and let the
+            # POST overlap the database enrichment and save below instead of waiting behind them
+            logger.info("Step 5: Sending analysis to webhook")
+            webhook_task = asyncio.create_task(self.send_analysis_to_webhook(
+                analysis_response=recommendations,
+                email_to=self.email_id
+            ))
+            self._webhook_tasks.add(webhook_task)
+            webhook_task.add_done_callback(self._on_webhook_task_done)
+
+            # Step 6: Save recommendations to database
+            logger.info("Step 6: Saving recommendations to database")
             try:
                 # Parse the recommendations JSON
-                recommendations_dict = json.loads(recommendations)
+                recommendations_dict = orjson.loads(recommendations)
 
                 # Use the current prices we extracted during stock analysis
                 entry_prices = self.stock_current_prices.copy()
@@ -1434,9 +1844,12 @@ body {{ font-family: Arial, sans-serif; padding: 20px; }}
                 logger.info(f"Added entry prices for {len(entry_prices)} stocks to recommendation")
 
                 # Get database session and save
+                from database import get_db, save_stock_recommendation
                 db = next(get_db())
                 try:
-                    saved_recommendation = save_stock_recommendation(
+                    # Blocking DB call runs in a worker thread so the webhook task keeps making progress
+                    saved_recommendation = await asyncio.to_thread(
+                        save_stock_recommendation,
                         db=db,
                         session_id=self.session_id,
                         user_id=self.user_id,
@@ -1450,29 +1863,36 @@ body {{ font-family: Arial, sans-serif; padding: 20px; }}
                     db.close()
             except Exception as db_error:
                 logger.error(f"Error saving recommendations to database: {db_error}")
-                # Continue with webhook even if database save fails
-
-            # Step 6: Send analysis to webhook
-            logger.info("Step 6: Sending analysis to webhook")
-            webhook_result = self.send_analysis_to_webhook(
-                analysis_response=recommendations,
-                email_to=self.email_id
-            )
-
-            logger.info(f"Webhook result: {webhook_result}")
+                # The webhook is already in flight, so a failed save doesn't block delivery
+
+            # The POST has been overlapping the save above, so this usually returns at once; asyncio.wait
+            # leaves the task running if it is still going when the wait times out
+            done, _ = await asyncio.wait({webhook_task}, timeout=_WEBHOOK_RESULT_WAIT_SECONDS)
+            if not done:
+                webhook_result = "Delivery in progress"
+                email_note = "The detailed analysis is being emailed to you."
+            elif webhook_task.cancelled() or webhook_task.exception() is not None:
+                webhook_result = "Error: Webhook delivery failed"
+                email_note = "The detailed analysis could not be emailed. Please try again later."
+            else:
+                webhook_result = webhook_task.result()
+                if webhook_result.startswith("Success"):
+                    email_note = "The detailed analysis has been emailed to you."
+                else:
+                    email_note = "The detailed analysis could not be emailed. Please try again later."
 
             # Return final response
             final_response = f"""Stock analysis completed successfully!
 
 Analysis Summary:
 - Portfolio analysis saved and investment details extracted
-- Analyzed {len(all_stocks)} stocks ({len(existing_stocks)} existing, {len(new_stocks)} new)
+- {analysis_stats}; {len(existing_stocks)} existing, {len(new_stocks)} new
 - Generated expert recommendations
-- Sent analysis to email: {self.email_id}
+- Sending analysis to email: {self.email_id}
 
 Webhook Status: {webhook_result}
 
-The detailed analysis has been emailed to you."""
+{email_note}"""
 
             logger.info("Programmatic flow completed successfully")
             return final_response
@@ -1482,18 +1902,13 @@ The detailed analysis has been emailed to you."""
             return f"Error in programmatic stock analysis flow: {str(e)}"
 
     def create_agent(self) -> Agent:
-        """Constructs the ADK agent for stock analysis and allocation management."""
-        return Agent(
+        """Constructs the ADK agent for stock analysis and allocation management, reusing it on later calls."""
+        if self._adk_agent is not None:
+            return self._adk_agent
+        self._adk_agent = Agent(
             model="gemini-2.5-flash",
             name="stock_analyser_agent",
-            instruction="""**Role:** You are a professional stock analyst using a programmatic workflow.
-
-**WORKFLOW:**
-When you receive any analysis request, you simply need to call the `execute_programmatic_flow` function with the entire analysis request as a parameter. This function will handle all the steps programmatically:
-
-Just call: execute_programmatic_flow(analysis_request)
-
-The function will return a complete summary of the analysis that was performed.""",
+            instruction=_AGENT_INSTRUCTION,
             tools=[
                 self.execute_programmatic_flow_tool,
                 self.stock_mcp_tool,
@@ -1504,6 +1919,7 @@ The function will return a complete summary of the analysis that was performed."
                 self.send_analysis_to_webhook_tool,
             ],
         )
+        return self._adk_agent
 
 
 # Create a global instance of the StockAnalyzerAgent for compatibility
@@ -1514,4 +1930,10 @@ def create_agent() -> Agent:
     global _stock_analyzer_agent
     if _stock_analyzer_agent is None:
         _stock_analyzer_agent = StockAnalyzerAgent()
-    return _stock_analyzer_agent.create_agent()
\ No newline at end of file
+    return _stock_analyzer_agent.create_agent()
+
+
+async def close_agent() -> None:
+    """Releases network resources held by the global StockAnalyzerAgent, if one was created."""
+    if _stock_analyzer_agent is not None:
+        await _stock_analyzer_agent.aclose()
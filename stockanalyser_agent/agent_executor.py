@@ -1,5 +1,6 @@
 import asyncio
-import time
+import logging
+import re
 from collections.abc import AsyncGenerator
 from logger import setup_logging, get_logger
 
@@ -23,17 +24,36 @@ from a2a.utils.errors import ServerError
 from google.adk import Runner
 from google.adk.events import Event
 from google.genai import types
+from executor_support import (
+    SESSION_NOT_FOUND_MESSAGE,
+    SessionMemo,
+    heartbeat,
+    retry_wait_seconds,
+)
+
+# Substrings of an exception message that mark it as transient and worth retrying
+_RETRYABLE_ERROR_RE = re.compile(
+    r"rate limit|quota exceeded|too many requests|429|resource_exhausted|service unavailable|internal server error|timeout|connection error|network error|cancel scope|mcp|generatorexit|runtime",
+    re.IGNORECASE,
+)
 
 logger = get_logger(__name__)
 logger.info("StockAnalyserAgentExecutor initialized with centralized logging")
 
 
+# The programmatic flow can run for minutes (per-stock MCP fetches, then the Pro model's portfolio
+# recommendation) with no agent events in between, so the host gets a status ping this often
+_HEARTBEAT_INTERVAL_SECONDS = 15
+
+
 class StockAnalyserAgentExecutor(AgentExecutor):
     """An AgentExecutor that runs Stock Analyser's ADK-based Agent."""
 
     def __init__(self, runner: Runner):
         self.runner = runner
-        self._running_sessions = {}
+        # Sessions resolved by _upsert_session are reused for repeat requests on the same context; the
+        # default ten-minute expiry is well inside the session service's one-hour idle cleanup
+        self._running_sessions = SessionMemo()
 
     def _run_agent(
         self, session_id, new_message: types.Content
@@ -51,7 +71,7 @@ class StockAnalyserAgentExecutor(AgentExecutor):
         Args:
             session_id: The session ID
             new_message: The message to process
-            max_retries: Maximum number of retry attempts (default: 3)
+            max_retries: Maximum number of retry attempts (default: 1)
         
         Yields:
             Events from the agent execution
@@ -66,7 +86,7 @@ class StockAnalyserAgentExecutor(AgentExecutor):
                 async for event in self._run_agent(session_id, new_message):
                     event_count += 1
                     if event_count % 10 == 0:  # Log every 10th event to track progress
-                        logger.debug(f"Processed {event_count} events for session {session_id}")
+                        logger.debug("Processed %d events for session %s", event_count, session_id)
                     yield event
                 
                 # If we reach here, the execution was successful
@@ -75,21 +95,33 @@ class StockAnalyserAgentExecutor(AgentExecutor):
                 
             except Exception as e:
                 last_exception = e
-                error_msg = str(e).lower()
                 
-                # Check if this is a retryable error
-                is_retryable = any(keyword in error_msg for keyword in [
-                    'rate limit', 'quota exceeded', 'too many requests', 
-                    'service unavailable', 'internal server error', 'timeout',
-                    'connection error', 'network error', 'cancel scope',
-                    'mcp', 'generatorexit', 'runtime'
-                ])
+                # Check if this is a retryable error (one case-insensitive scan of the message)
+                error_msg = str(e)
+                is_retryable = _RETRYABLE_ERROR_RE.search(error_msg) is not None
+
+                if SESSION_NOT_FOUND_MESSAGE in error_msg:
+                    # Drop the stale memo entry and recreate the session before trying again
+                    self._running_sessions.discard(session_id)
+                    if attempt < max_retries and not event_count:
+                        logger.warning(f"Session {session_id} was not found by the runner; recreating it")
+                        await self._upsert_session(session_id)
+                        continue
                 
+                # A retry replays the whole turn, so once events (and the tool calls behind them, such as
+                # the portfolio save and email) have gone out, a replay would repeat those side effects
+                if event_count:
+                    logger.error(
+                        f"Attempt {attempt + 1} failed for session {session_id} after {event_count} events; "
+                        f"not retrying to avoid replaying completed steps: {e}"
+                    )
+                    raise last_exception
+
                 if attempt < max_retries and is_retryable:
-                    wait_time = (2 ** attempt) * 1  # Exponential backoff: 1s, 2s, 4s
+                    wait_time = retry_wait_seconds(attempt, error_msg)
                     logger.warning(
                         f"Attempt {attempt + 1} failed for session {session_id} with retryable error: {e}. "
-                        f"Retrying in {wait_time} seconds..."
+                        f"Retrying in {wait_time:.1f} seconds..."
                     )
                     await asyncio.sleep(wait_time)
                 else:
@@ -114,21 +146,25 @@ class StockAnalyserAgentExecutor(AgentExecutor):
         session_obj = await self._upsert_session(session_id)
         session_id = session_obj.id
 
+        # Status pings keep upstream callers from timing out while the model is thinking between events
+        heartbeat_task = asyncio.create_task(heartbeat(task_updater, _HEARTBEAT_INTERVAL_SECONDS))
         try:
             async for event in self._run_agent_with_retry(session_id, new_message):
+                # Resolved once per event; content is None for some events
+                content_parts = getattr(event.content, "parts", None) or []
                 if event.is_final_response():
-                    # Log raw event content for debugging
-                    if event.content and event.content.parts:
-                        logger.info(f"Raw event parts for session {session_id}: {len(event.content.parts)} parts")
-                        for i, raw_part in enumerate(event.content.parts):
-                            logger.info(f"Raw part {i+1}: text={bool(raw_part.text)}, file_data={bool(raw_part.file_data)}, inline_data={bool(raw_part.inline_data)}")
-                            if raw_part.text:
-                                logger.info(f"Raw part {i+1} text preview: {raw_part.text[:100]}...")
-
-                    parts = convert_genai_parts_to_a2a(
-                        event.content.parts if event.content and event.content.parts else []
-                    )
-                    logger.info(f"Final response received from agent for session {session_id}: {len(parts)} parts")
+                    # Per-part details are only formatted when a DEBUG handler will emit them
+                    if content_parts and logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Raw event parts for session %s: %d parts", session_id, len(content_parts))
+                        for i, raw_part in enumerate(content_parts):
+                            logger.debug(
+                                "Raw part %d: text=%s, file_data=%s, inline_data=%s, preview=%.100s",
+                                i + 1, bool(raw_part.text), bool(raw_part.file_data),
+                                bool(raw_part.inline_data), raw_part.text or "",
+                            )
+
+                    parts = convert_genai_parts_to_a2a(content_parts)
+                    logger.info("Final response received from agent for session %s: %d parts", session_id, len(parts))
 
                     # If no parts were converted, create a default completion message
                     if not parts:
@@ -136,20 +172,22 @@ class StockAnalyserAgentExecutor(AgentExecutor):
                         parts = [Part(root=TextPart(text="Analysis completed successfully. Results have been saved to the system."))]
 
                     # Log the response content for debugging
-                    for i, part in enumerate(parts):
-                        if hasattr(part.root, 'text'):
-                            logger.info(f"Response part {i+1}: {len(part.root.text)} characters")
-                            logger.debug(f"Response part {i+1} preview: {part.root.text[:200]}...")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        for i, part in enumerate(parts):
+                            if hasattr(part.root, 'text'):
+                                logger.debug(
+                                    "Response part %d: %d characters, preview: %.200s...",
+                                    i + 1, len(part.root.text), part.root.text,
+                                )
 
                     # Send the response back to the host agent through the task updater
                     try:
-                        logger.info(f"About to call task_updater.add_artifact for session {session_id} with {len(parts)} parts")
-                        await task_updater.add_artifact(parts)
-                        logger.info(f"Successfully called task_updater.add_artifact for session {session_id}")
-
-                        logger.info(f"About to call task_updater.complete() for session {session_id}")
+                        logger.debug("About to call task_updater.add_artifact for session %s with %d parts", session_id, len(parts))
+                        await task_updater.add_artifact(
+                            parts, append=False, last_chunk=True
+                        )
                         await task_updater.complete()
-                        logger.info(f"Successfully called task_updater.complete() for session {session_id}")
+                        logger.info("Completed task for session %s", session_id)
                     except Exception as task_error:
                         logger.error(f"Error completing task for session {session_id}: {task_error}")
                         logger.error(f"Task error type: {type(task_error)}")
@@ -157,16 +195,15 @@ class StockAnalyserAgentExecutor(AgentExecutor):
                         # Don't raise the error as the analysis was successful, just log it
                     break
                 if not event.get_function_calls():
+                    update_parts = convert_genai_parts_to_a2a(content_parts)
+                    # Function responses and other payload-free events have nothing to report
+                    if not update_parts:
+                        logger.debug("Skipping event with no content")
+                        continue
                     logger.debug("Yielding update response")
                     await task_updater.update_status(
                         TaskState.working,
-                        message=task_updater.new_agent_message(
-                            convert_genai_parts_to_a2a(
-                                event.content.parts
-                                if event.content and event.content.parts
-                                else []
-                            ),
-                        ),
+                        message=task_updater.new_agent_message(update_parts),
                     )
                 else:
                     logger.debug("Skipping event")
@@ -185,6 +222,9 @@ class StockAnalyserAgentExecutor(AgentExecutor):
             except Exception as cleanup_error:
                 logger.warning(f"Error during cleanup after failure for session {session_id}: {cleanup_error}")
                 # Don't re-raise cleanup errors as they're not critical
+        finally:
+            heartbeat_task.cancel()
+            await asyncio.gather(heartbeat_task, return_exceptions=True)
 
     async def execute(
         self,
@@ -225,6 +265,10 @@ class StockAnalyserAgentExecutor(AgentExecutor):
         raise ServerError(error=UnsupportedOperationError())
 
     async def _upsert_session(self, session_id: str):
+        session = self._running_sessions.get(session_id)
+        if session is not None:
+            return session
+
         session = await self.runner.session_service.get_session(
             app_name=self.runner.app_name, user_id="stock_analyser_agent", session_id=session_id
         )
@@ -236,6 +280,8 @@ class StockAnalyserAgentExecutor(AgentExecutor):
             )
         if session is None:
             raise RuntimeError(f"Failed to get or create session: {session_id}")
+
+        self._running_sessions.put(session_id, session)
         return session
 
 
@@ -244,62 +290,105 @@ def convert_a2a_parts_to_genai(parts: list[Part]) -> list[types.Part]:
     return [convert_a2a_part_to_genai(part) for part in parts]
 
 
+def _text_part_to_genai(root: TextPart) -> types.Part:
+    return types.Part(text=root.text)
+
+
+def _file_with_uri_to_genai(file: FileWithUri) -> types.Part:
+    return types.Part(
+        file_data=types.FileData(
+            file_uri=file.uri, mime_type=file.mimeType
+        )
+    )
+
+
+def _file_with_bytes_to_genai(file: FileWithBytes) -> types.Part:
+    # Only a str payload needs encoding; bytes are handed to the Blob without a copy
+    file_data = file.bytes
+    if isinstance(file_data, str):
+        file_data = file_data.encode("utf-8")
+    return types.Part(
+        inline_data=types.Blob(
+            data=file_data,
+            mime_type=file.mimeType or "application/octet-stream",
+        )
+    )
+
+
+# FilePart.file payload type -> converter
+_A2A_FILE_TO_GENAI = {
+    FileWithUri: _file_with_uri_to_genai,
+    FileWithBytes: _file_with_bytes_to_genai,
+}
+
+
+def _file_part_to_genai(root: FilePart) -> types.Part:
+    converter = _A2A_FILE_TO_GENAI.get(type(root.file))
+    if converter is None:
+        raise ValueError(f"Unsupported file type: {type(root.file)}")
+    return converter(root.file)
+
+
+# Part.root type -> converter; one dict lookup instead of a chain of isinstance checks per part
+_A2A_PART_TO_GENAI = {
+    TextPart: _text_part_to_genai,
+    FilePart: _file_part_to_genai,
+}
+
+
 def convert_a2a_part_to_genai(part: Part) -> types.Part:
     """Convert a single A2A Part type into a Google Gen AI Part type."""
     root = part.root
-    if isinstance(root, TextPart):
-        return types.Part(text=root.text)
-    if isinstance(root, FilePart):
-        if isinstance(root.file, FileWithUri):
-            return types.Part(
-                file_data=types.FileData(
-                    file_uri=root.file.uri, mime_type=root.file.mimeType
-                )
-            )
-        if isinstance(root.file, FileWithBytes):
-            return types.Part(
-                inline_data=types.Blob(
-                    data=root.file.bytes.encode("utf-8"),
-                    mime_type=root.file.mimeType or "application/octet-stream",
-                )
-            )
-        raise ValueError(f"Unsupported file type: {type(root.file)}")
-    raise ValueError(f"Unsupported part type: {type(part)}")
+    converter = _A2A_PART_TO_GENAI.get(type(root))
+    if converter is None:
+        raise ValueError(f"Unsupported part type: {type(part)}")
+    return converter(root)
 
 
 def convert_genai_parts_to_a2a(parts: list[types.Part]) -> list[Part]:
     """Convert a list of Google Gen AI Part types into a list of A2A Part types."""
-    return [
-        convert_genai_part_to_a2a(part)
-        for part in parts
-        if (part.text or part.file_data or part.inline_data)
-    ]
+    converted = (_convert_genai_part_to_a2a_or_none(part) for part in parts)
+    return [part for part in converted if part is not None]
 
 
 def convert_genai_part_to_a2a(part: types.Part) -> Part:
     """Convert a single Google Gen AI Part type into an A2A Part type."""
-    if part.text:
-        return Part(root=TextPart(text=part.text))
-    if part.file_data:
-        if not part.file_data.file_uri:
+    converted = _convert_genai_part_to_a2a_or_none(part)
+    if converted is None:
+        raise ValueError(f"Unsupported part type: {part}")
+    return converted
+
+
+def _convert_genai_part_to_a2a_or_none(part: types.Part) -> Part | None:
+    """Convert a Gen AI Part, or return None for parts with no text or file payload (e.g. function calls)."""
+    # Each field is read once; attribute access on the pydantic model isn't free
+    text, file_data, inline_data_part = part.text, part.file_data, part.inline_data
+    if text:
+        return Part(root=TextPart(text=text))
+    if file_data:
+        if not file_data.file_uri:
             raise ValueError("File URI is missing")
         return Part(
             root=FilePart(
                 file=FileWithUri(
-                    uri=part.file_data.file_uri,
-                    mimeType=part.file_data.mime_type,
+                    uri=file_data.file_uri,
+                    mimeType=file_data.mime_type,
                 )
             )
         )
-    if part.inline_data:
-        if not part.inline_data.data:
+    if inline_data_part:
+        if not inline_data_part.data:
             raise ValueError("Inline data is missing")
+        # A2A carries file bytes as a string, so only bytes payloads are decoded
+        inline_data = inline_data_part.data
+        if isinstance(inline_data, bytes):
+            inline_data = inline_data.decode("utf-8")
         return Part(
             root=FilePart(
                 file=FileWithBytes(
-                    bytes=part.inline_data.data.decode("utf-8"),
-                    mimeType=part.inline_data.mime_type,
+                    bytes=inline_data,
+                    mimeType=inline_data_part.mime_type,
                 )
             )
         )
-    raise ValueError(f"Unsupported part type: {part}")
+    return None
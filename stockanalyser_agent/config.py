@@ -31,8 +31,20 @@ class Config:
     # Free user message limit
     FREE_USER_MESSAGE_LIMIT = int(os.getenv("FREE_USER_MESSAGE_LIMIT", "30"))
 
+    # Activepieces Webhook Configuration
+    ACTIVEPIECES_WEBHOOK_URL = os.getenv(
+        "ACTIVEPIECES_WEBHOOK_URL",
+        "https://cloud.activepieces.com/api/v1/webhooks/a3jeiaYrX1ZqVdSAye25A"
+    )
+    ACTIVEPIECES_USERNAME = os.getenv("ACTIVEPIECES_USERNAME")
+    ACTIVEPIECES_PASSWORD = os.getenv("ACTIVEPIECES_PASSWORD")
+    # Gzip webhook bodies larger than 4 KB (only enable if the endpoint decodes Content-Encoding: gzip)
+    ACTIVEPIECES_GZIP_PAYLOAD = os.getenv("ACTIVEPIECES_GZIP_PAYLOAD", "FALSE").upper() == "TRUE"
+
     # MCP Configuration
     MCP_DIRECTORY = os.getenv("MCP_DIRECTORY", "/Users/debojyotichakraborty/codebase/finhub-mcp")  # Default to local path
+    # Maximum number of concurrent get_stock_info calls while analyzing a portfolio
+    MCP_MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", "8"))
 
     @classmethod
     def is_local(cls):
@@ -0,0 +1,80 @@
+"""
+Retry backoff, heartbeat and session memo helpers shared by the agent executors.
+
+stockreport_analyser_agent links to this file (like database.py from host_agent), so both
+executors run the same code; each Dockerfile copies it next to agent_executor.py.
+"""
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from a2a.server.tasks import TaskUpdater
+from a2a.types import TaskState
+
+logger = logging.getLogger(__name__)
+
+# ADK's Runner raises ValueError("Session not found: <id>") when the session service no longer has
+# a session, e.g. after LimitedContextSessionService's idle cleanup dropped a memoized one
+SESSION_NOT_FOUND_MESSAGE = "Session not found"
+
+# Quota/429 errors need the model to cool down; other retryable errors are transient network blips
+RATE_LIMIT_ERROR_RE = re.compile(r"rate limit|quota exceeded|too many requests|429|resource_exhausted", re.IGNORECASE)
+RATE_LIMIT_BACKOFF_CAP_SECONDS = 60
+TRANSIENT_BACKOFF_CAP_SECONDS = 5
+
+
+def retry_wait_seconds(attempt: int, error_msg: str) -> float:
+    """Returns a jittered exponential backoff so requests that failed together don't retry in lockstep."""
+    if RATE_LIMIT_ERROR_RE.search(error_msg):
+        base, cap = 2 ** (attempt + 1), RATE_LIMIT_BACKOFF_CAP_SECONDS
+    else:
+        base, cap = 2 ** attempt, TRANSIENT_BACKOFF_CAP_SECONDS
+    return min(cap, base * (0.5 + random.random()))
+
+
+async def heartbeat(task_updater: TaskUpdater, interval: float) -> None:
+    """Posts a bare working status every interval seconds until cancelled or the task is closed."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # No message: a bare status event keeps the stream alive without adding to the task history
+            await task_updater.update_status(TaskState.working)
+        except Exception as e:
+            # The task may already have reached a terminal state; there is nothing left to keep alive
+            logger.debug("Stopping heartbeat: %s", e)
+            return
+
+
+class SessionMemo:
+    """
+    Remembers sessions resolved for a context so repeat requests skip the session service lookup.
+    Entries expire after ttl_seconds, which must stay inside the session service's idle cleanup,
+    and the least recently used entry is evicted past max_entries.
+    """
+
+    def __init__(self, ttl_seconds: float = 600, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # session_id -> (monotonic time it was last resolved, session)
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[Any]:
+        """Returns the memoized session, or None if it is unknown or has expired."""
+        cached = self._entries.get(session_id)
+        if cached is None or time.monotonic() - cached[0] >= self.ttl_seconds:
+            return None
+        self._entries.move_to_end(session_id)
+        return cached[1]
+
+    def put(self, session_id: str, session: Any) -> None:
+        self._entries[session_id] = (time.monotonic(), session)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
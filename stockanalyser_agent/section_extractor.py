@@ -3,7 +3,20 @@ Section Extractor for Portfolio Analysis
 Extracts specific sections from analysis response using keyword-based filtering.
 """
 import re
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional, Pattern, Tuple
+
+# Compiled once: extract_stock_recommendations runs these on every line of the recommendations section
+_TICKER_RE = re.compile(r'Ticker:\s*(\w+)')
+_RECOMMENDATION_RE = re.compile(r'\b(BUY|HOLD|SELL)\b')
+# Field labels that end a multi-line Reasoning value
+_FIELD_PREFIXES = ('Ticker:', 'RECOMMENDATION:', 'Investment Amount:', 'Key Metrics:')
+
+
+@lru_cache(maxsize=32)
+def _keyword_pattern(keywords: Tuple[str, ...]) -> Pattern:
+    """Case-insensitive alternation of the literal keywords, compiled once per keyword set."""
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
 
 
 class SectionExtractor:
@@ -36,18 +49,20 @@ class SectionExtractor:
             Tuple of (start_position, end_position) or None if not found
         """
         # Find start position
-        start_match = re.search(re.escape(keyword), text, re.IGNORECASE)
+        start_match = _keyword_pattern((keyword,)).search(text)
         if not start_match:
             return None
 
         start_pos = start_match.start()
 
-        # Find end position by looking for the next section keyword
+        # Find end position at the nearest next section keyword: one alternation scan that stops at
+        # the first hit, instead of a full scan over a sliced copy of the text per keyword. The
+        # section keyword sets are fixed, so each alternation is compiled only on first use
         end_pos = len(text)
-        for next_keyword in next_keywords:
-            next_match = re.search(re.escape(next_keyword), text[start_pos + len(keyword):], re.IGNORECASE)
+        if next_keywords:
+            next_match = _keyword_pattern(tuple(next_keywords)).search(text, start_pos + len(keyword))
             if next_match:
-                end_pos = min(end_pos, start_pos + len(keyword) + next_match.start())
+                end_pos = next_match.start()
 
         return (start_pos, end_pos)
 
@@ -192,6 +207,7 @@ class SectionExtractor:
 
         recommendations = []
         lines = section.split('\n')
+        wanted_type = recommendation_type.upper() if recommendation_type else None
 
         i = 0
         while i < len(lines):
@@ -200,7 +216,7 @@ class SectionExtractor:
             # Detect start of a stock recommendation
             if line.startswith('Ticker:'):
                 # Parse ticker and recommendation
-                ticker_match = re.search(r'Ticker:\s*(\w+)', line)
+                ticker_match = _TICKER_RE.search(line)
 
                 if ticker_match:
                     ticker = ticker_match.group(1)
@@ -230,7 +246,7 @@ class SectionExtractor:
 
                         # Parse RECOMMENDATION line
                         if detail_line.startswith('RECOMMENDATION:'):
-                            rec_match = re.search(r'(BUY|HOLD|SELL)', detail_line)
+                            rec_match = _RECOMMENDATION_RE.search(detail_line)
                             if rec_match:
                                 current_stock['recommendation'] = rec_match.group(1)
                         elif detail_line.startswith('Investment Amount:'):
@@ -239,14 +255,14 @@ class SectionExtractor:
                             current_stock['key_metrics'] = detail_line.replace('Key Metrics:', '').strip()
                         elif detail_line.startswith('Reasoning:'):
                             current_stock['reasoning'] = detail_line.replace('Reasoning:', '').strip()
-                        elif current_stock['reasoning'] and not any(detail_line.startswith(x) for x in ['Ticker:', 'RECOMMENDATION:', 'Investment Amount:', 'Key Metrics:']):
+                        elif current_stock['reasoning'] and not detail_line.startswith(_FIELD_PREFIXES):
                             # Continue reasoning from previous line
                             current_stock['reasoning'] += ' ' + detail_line
 
                         i += 1
 
                     # Filter by recommendation type if specified
-                    if recommendation_type is None or current_stock['recommendation'] == recommendation_type.upper():
+                    if wanted_type is None or current_stock['recommendation'] == wanted_type:
                         recommendations.append(current_stock)
                     continue
 
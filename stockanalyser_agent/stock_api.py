@@ -1,7 +1,9 @@
 import json
 import os
-from typing import List
+import tempfile
+from typing import List, Optional, Tuple
 
+import orjson
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
@@ -29,25 +31,53 @@ class StockTickerResponse(BaseModel):
     stock_type: str
     stock_tickers: List[str]
 
-# File path for storing the JSON data
-STOCK_DATA_FILE = "stock_data.json"
+# File path for storing the JSON data (relative to the working directory at startup, resolved once)
+STOCK_DATA_FILE = os.path.abspath("stock_data.json")
+_STOCK_DATA_DIR = os.path.dirname(STOCK_DATA_FILE)
+# Mode for a freshly created file; mkstemp's 0600 would hide it from the host container and other readers
+_STOCK_DATA_DEFAULT_MODE = 0o644
+# The file is machine-read, so it is written compactly unless STOCK_DATA_PRETTY_JSON=TRUE asks for indentation
+_STOCK_DATA_DUMP_OPTION = orjson.OPT_INDENT_2 if os.getenv("STOCK_DATA_PRETTY_JSON") == "TRUE" else None
+
+# Last decoded stock data with the mtime it was read at, so unchanged files are not re-parsed per request
+_stock_data_cache: Optional[Tuple[int, dict]] = None
 
 def load_stock_data() -> dict:
-    """Load existing stock data from JSON file."""
-    if os.path.exists(STOCK_DATA_FILE):
-        try:
-            with open(STOCK_DATA_FILE, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Error loading stock data: {e}")
-            return {}
-    return {}
+    """Load existing stock data from JSON file, reusing the last decode while the file is unchanged."""
+    global _stock_data_cache
+    try:
+        mtime_ns = os.stat(STOCK_DATA_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _stock_data_cache is not None and _stock_data_cache[0] == mtime_ns:
+        # Shallow copy: callers replace top-level entries before saving
+        return dict(_stock_data_cache[1])
+    try:
+        with open(STOCK_DATA_FILE, 'rb') as f:
+            data = orjson.loads(f.read())
+    except (json.JSONDecodeError, IOError) as e:
+        logger.error(f"Error loading stock data: {e}")
+        return {}
+    _stock_data_cache = (mtime_ns, data)
+    return dict(data)
 
 def save_stock_data(data: dict) -> None:
-    """Save stock data to JSON file."""
+    """Save stock data to JSON file, replacing it atomically so readers never see a partial write."""
     try:
-        with open(STOCK_DATA_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+        try:
+            mode = os.stat(STOCK_DATA_FILE).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = _STOCK_DATA_DEFAULT_MODE
+        fd, tmp_path = tempfile.mkstemp(dir=_STOCK_DATA_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                # Carry the existing permissions over, since os.replace keeps the temp file's 0600
+                os.fchmod(f.fileno(), mode)
+                f.write(orjson.dumps(data, option=_STOCK_DATA_DUMP_OPTION))
+            os.replace(tmp_path, STOCK_DATA_FILE)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
         logger.info(f"Stock data saved successfully")
     except IOError as e:
         logger.error(f"Error saving stock data: {e}")
@@ -78,11 +108,12 @@ async def upsert_stock_tickers(request: StockTickerRequest):
         # Load existing data
         stock_data = load_stock_data()
         
-        # Upsert the stock tickers for the given type
-        stock_data[request.stock_type] = request.stock_tickers
-        
-        # Save the updated data
-        save_stock_data(stock_data)
+        # Upsert the stock tickers for the given type, skipping the write when nothing changed
+        if stock_data.get(request.stock_type) != request.stock_tickers:
+            stock_data[request.stock_type] = request.stock_tickers
+            save_stock_data(stock_data)
+        else:
+            logger.info(f"Tickers for type '{request.stock_type}' unchanged, skipping save")
         
         logger.info(f"Successfully upserted {len(request.stock_tickers)} tickers for type '{request.stock_type}'")
         
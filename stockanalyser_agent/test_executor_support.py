@@ -0,0 +1,47 @@
+"""
+Tests for the retry, heartbeat and session memo helpers shared by both agent executors.
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from a2a.types import TaskState
+
+import executor_support
+from executor_support import SessionMemo, heartbeat, retry_wait_seconds
+
+
+def test_retry_wait_seconds_caps_by_error_kind():
+    with patch.object(executor_support.random, "random", return_value=1.0):
+        # Rate limits double from 2s and stop at the one-minute cap
+        assert retry_wait_seconds(0, "429 RESOURCE_EXHAUSTED") == 3.0
+        assert retry_wait_seconds(10, "Quota exceeded") == executor_support.RATE_LIMIT_BACKOFF_CAP_SECONDS
+        # Other transient errors start at 1s and stop at five seconds
+        assert retry_wait_seconds(0, "connection error") == 1.5
+        assert retry_wait_seconds(10, "connection error") == executor_support.TRANSIENT_BACKOFF_CAP_SECONDS
+    with patch.object(executor_support.random, "random", return_value=0.0):
+        assert retry_wait_seconds(0, "connection error") == 0.5
+
+
+def test_session_memo_expires_and_evicts():
+    memo = SessionMemo(ttl_seconds=10, max_entries=2)
+    with patch.object(executor_support.time, "monotonic", return_value=100.0):
+        memo.put("a", "session-a")
+        memo.put("b", "session-b")
+        assert memo.get("a") == "session-a"
+        # "a" was just used, so adding a third entry evicts "b"
+        memo.put("c", "session-c")
+        assert memo.get("b") is None
+    with patch.object(executor_support.time, "monotonic", return_value=110.0):
+        assert memo.get("a") is None
+    memo.discard("c")
+    assert memo.get("c") is None
+
+
+def test_heartbeat_sends_bare_status_until_the_task_closes():
+    task_updater = MagicMock()
+    task_updater.update_status = AsyncMock(side_effect=[None, RuntimeError("task is already completed")])
+
+    asyncio.run(asyncio.wait_for(heartbeat(task_updater, 0), timeout=1))
+
+    assert task_updater.update_status.await_count == 2
+    task_updater.update_status.assert_awaited_with(TaskState.working)
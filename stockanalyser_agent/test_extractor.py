@@ -89,6 +89,24 @@ Reasoning: Tesla meets the criteria for a sell recommendation due to its combina
 - Sector Concentration: The recommended portfolio remains heavily concentrated in the Information Technology and Communication Services sectors. Any market rotation away from technology could cause this portfolio to underperform the broader market."""
 
 
+def test_recommendation_verdict_parsing():
+    """The verdict is the first standalone BUY/HOLD/SELL on the RECOMMENDATION line."""
+    extractor = SectionExtractor()
+    section = """3. INDIVIDUAL STOCK RECOMMENDATIONS
+
+Ticker: NVDA
+RECOMMENDATION: Strong BUY
+
+Ticker: INTC
+RECOMMENDATION: Selling pressure - HOLD
+
+4. RISK WARNINGS
+- None"""
+
+    verdicts = {rec['ticker']: rec['recommendation'] for rec in extractor.extract_stock_recommendations(section)}
+    assert verdicts == {'NVDA': 'BUY', 'INTC': 'HOLD'}
+
+
 def main():
     """Demonstrate section extraction functionality."""
     extractor = SectionExtractor()
@@ -7,7 +7,7 @@ import os
 import sys
 import asyncio
 import json
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 # Add the current directory to the path so we can import the agent
 sys.path.insert(0, os.path.dirname(__file__))
@@ -15,6 +15,14 @@ sys.path.insert(0, os.path.dirname(__file__))
 from agent import StockAnalyzerAgent
 
 
+async def _stream_chunks(*texts):
+    """Async iterator of response chunks, shaped like generate_content_stream's result."""
+    for text in texts:
+        chunk = Mock()
+        chunk.text = text
+        yield chunk
+
+
 async def test_programmatic_flow():
     """Test the programmatic flow with mock data."""
 
@@ -43,34 +51,55 @@ async def test_programmatic_flow():
     # Create the agent
     agent = StockAnalyzerAgent()
 
-    # Mock the MCP tool calls to avoid external dependencies
-    async def mock_mcp_call(tool_name, params):
-        ticker = params.get('ticker', 'UNKNOWN')
-        return {
-            'ticker': ticker,
-            'price': 150.0,
-            'recommendation': 'BUY',
-            'analysis': f'Mock analysis for {ticker}'
-        }
+    # Mock the MCP session so no MCP server is spawned; the flow calls get_stock_info through the
+    # session returned by _get_mcp_session, not through stock_mcp_tool
+    async def mock_mcp_call(tool_name, arguments):
+        ticker = arguments.get('symbol', 'UNKNOWN')
+        content_item = Mock()
+        content_item.text = json.dumps({
+            'symbol': ticker,
+            'stock_type': 'EQUITY',
+            'core_valuation_metrics': {'currentPrice': 150.0},
+        })
+        result = Mock()
+        result.content = [content_item]
+        return result
+
+    mock_mcp_session = Mock()
+    mock_mcp_session.call_tool = mock_mcp_call
 
     # Mock the webhook call
-    def mock_webhook_call(analysis_response, email_to, webhook_url=None, username=None, password=None):
+    async def mock_webhook_call(analysis_response, email_to, webhook_url=None, username=None, password=None):
         return f"Success: Mock webhook call sent to {email_to}"
 
     # Apply mocks
-    agent.stock_mcp_tool.call_tool = mock_mcp_call
+    agent._get_mcp_session = AsyncMock(return_value=mock_mcp_session)
     agent.send_analysis_to_webhook = mock_webhook_call
 
-    # Mock the LLM calls to avoid API dependencies
-    with patch('agent.genai.Client') as mock_client:
+    # Mock the LLM calls to avoid API dependencies. The shared client is memoized by
+    # _get_genai_client, so patch the accessor rather than genai.Client
+    with patch('agent._get_genai_client') as mock_get_client:
         # Mock client instance
         mock_client_instance = Mock()
-        mock_client.return_value = mock_client_instance
+        mock_get_client.return_value = mock_client_instance
 
         # Mock the generate_content response for investment details extraction
         mock_investment_response = Mock()
-        mock_investment_response.text = "INVESTMENT_AMOUNT: 10000\nEMAIL_ID: test@example.com"
-        mock_client_instance.models.generate_content.return_value = mock_investment_response
+        mock_investment_response.text = '{"investment_amount": "10000", "email_id": "test@example.com", "user_id": "not_found", "session_id": "not_found"}'
+        mock_client_instance.aio.models.generate_content = AsyncMock(return_value=mock_investment_response)
+
+        # Portfolio recommendations are streamed; each call gets a fresh iterator split across two chunks
+        mock_recommendations = json.dumps({
+            "allocation_breakdown": [],
+            "individual_stock_recommendations": [
+                {"ticker": "AAPL", "recommendation": "HOLD", "investment_amount": "$0"}
+            ],
+            "risk_warnings": [],
+        })
+        half = len(mock_recommendations) // 2
+        mock_client_instance.aio.models.generate_content_stream = AsyncMock(
+            side_effect=lambda *args, **kwargs: _stream_chunks(mock_recommendations[:half], mock_recommendations[half:])
+        )
 
         try:
             # Test the programmatic flow
@@ -95,7 +124,7 @@ async def test_programmatic_flow():
             return False
 
 
-def test_json_functions():
+async def test_json_functions():
     """Test that the modified functions return proper JSON."""
 
     agent = StockAnalyzerAgent()
@@ -104,17 +133,17 @@ def test_json_functions():
     test_request = "Analyze AAPL, GOOGL (existing) and TSLA, MSFT (new stocks). Invest $5000. Email: user@test.com"
 
     # Mock the LLM call
-    with patch('agent.genai.Client') as mock_client:
+    with patch('agent._get_genai_client') as mock_get_client:
         mock_client_instance = Mock()
-        mock_client.return_value = mock_client_instance
+        mock_get_client.return_value = mock_client_instance
 
         mock_response = Mock()
-        mock_response.text = "EXISTING: AAPL,GOOGL\nNEW: TSLA,MSFT\nINVESTMENT_AMOUNT: 5000\nEMAIL_ID: user@test.com"
-        mock_client_instance.models.generate_content.return_value = mock_response
+        mock_response.text = '{"existing_stocks": ["AAPL", "GOOGL"], "new_stocks": ["TSLA", "MSFT"], "share_counts": [], "investment_amount": "5000", "email_id": "user@test.com", "user_id": "not_found", "session_id": "not_found"}'
+        mock_client_instance.aio.models.generate_content = AsyncMock(return_value=mock_response)
 
         try:
             # Test stock extraction
-            result = agent.extract_stocks_from_analysis_request(test_request)
+            result = await agent.extract_stocks_from_analysis_request(test_request)
             data = json.loads(result)
 
             print("✅ extract_stocks_from_analysis_request returns valid JSON")
@@ -131,16 +160,16 @@ def test_json_functions():
             print(f"❌ Error testing extract_stocks_from_analysis_request: {e}")
 
     # Test save_portfolio_analysis_to_file returns JSON
-    with patch('agent.genai.Client') as mock_client:
+    with patch('agent._get_genai_client') as mock_get_client:
         mock_client_instance = Mock()
-        mock_client.return_value = mock_client_instance
+        mock_get_client.return_value = mock_client_instance
 
         mock_response = Mock()
-        mock_response.text = "INVESTMENT_AMOUNT: 5000\nEMAIL_ID: user@test.com"
-        mock_client_instance.models.generate_content.return_value = mock_response
+        mock_response.text = '{"investment_amount": "5000", "email_id": "user@test.com", "user_id": "not_found", "session_id": "not_found"}'
+        mock_client_instance.aio.models.generate_content = AsyncMock(return_value=mock_response)
 
         try:
-            result = agent.save_portfolio_analysis_to_file(test_request)
+            result = await agent.save_portfolio_analysis_to_file(test_request)
             data = json.loads(result)
 
             print("✅ save_portfolio_analysis_to_file returns valid JSON")
@@ -162,7 +191,7 @@ async def main():
     print("=== Testing New Programmatic Flow ===\n")
 
     print("1. Testing JSON function returns...")
-    test_json_functions()
+    await test_json_functions()
 
     print("\n2. Testing full programmatic flow...")
     success = await test_programmatic_flow()
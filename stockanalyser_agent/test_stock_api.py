@@ -0,0 +1,22 @@
+"""
+Tests for stock_data.json persistence in the stock ticker API.
+"""
+import os
+import stat
+
+import stock_api
+
+
+def test_save_stock_data_keeps_file_mode(tmp_path, monkeypatch):
+    """An atomic save must not narrow the file's permissions to mkstemp's 0600."""
+    data_file = tmp_path / "stock_data.json"
+    data_file.write_bytes(b"{}")
+    os.chmod(data_file, 0o644)
+    monkeypatch.setattr(stock_api, "STOCK_DATA_FILE", str(data_file))
+    monkeypatch.setattr(stock_api, "_STOCK_DATA_DIR", str(tmp_path))
+
+    stock_api.save_stock_data({"USA_TECH": ["AAPL", "MSFT"]})
+
+    assert stat.S_IMODE(os.stat(data_file).st_mode) == 0o644
+    assert stock_api.load_stock_data() == {"USA_TECH": ["AAPL", "MSFT"]}
+    assert list(tmp_path.iterdir()) == [data_file]
@@ -2,6 +2,7 @@
 """
 Test script to verify the webhook function works correctly.
 """
+import asyncio
 import os
 import sys
 from dotenv import load_dotenv
@@ -12,7 +13,7 @@ load_dotenv()
 def test_webhook_function():
     """Test the webhook function with sample data."""
     try:
-        from agent import send_analysis_to_webhook
+        from agent import StockAnalyzerAgent
         
         print("✅ Import successful")
         
@@ -21,8 +22,17 @@ def test_webhook_function():
         
         print(f"📤 Testing webhook function with data: {test_analysis[:50]}...")
         
-        # Test the function
-        result = send_analysis_to_webhook(test_analysis)
+        # Test the function (send_analysis_to_webhook is async and its client is closed afterwards)
+        async def send():
+            stock_agent = StockAnalyzerAgent()
+            try:
+                return await stock_agent.send_analysis_to_webhook(
+                    test_analysis, email_to=os.getenv("TEST_EMAIL_TO", "test@example.com")
+                )
+            finally:
+                await stock_agent.aclose()
+
+        result = asyncio.run(send())
         
         print(f"📋 Result: {result}")
         
@@ -6,6 +6,8 @@ import io
 import os
 import re
 import sys
+import threading
+from functools import lru_cache
 from google import genai
 from google.genai.types import GenerateContentConfig
 
@@ -18,6 +20,29 @@ except ImportError as e:
     print(f"Warning: Could not import database functions: {e}")
     print("Portfolio upload status will not be tracked in the database")
 
+# Reused across statement uploads so credentials are resolved once per process. This agent makes a
+# single extraction call per upload, so the google-genai default connection pool is left as is
+_genai_client = None
+_genai_client_lock = threading.Lock()
+
+
+def _get_genai_client():
+    """Client for ticker extraction, built on first use; None when neither Vertex AI nor an API key is set."""
+    global _genai_client
+    if _genai_client is None:
+        with _genai_client_lock:
+            if _genai_client is None:
+                if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
+                    _genai_client = genai.Client(vertexai=True)
+                    print("Created shared Gemini client using Vertex AI")
+                else:
+                    api_key = os.getenv("GOOGLE_API_KEY")
+                    if not api_key:
+                        return None
+                    _genai_client = genai.Client(api_key=api_key)
+                    print("Created shared Gemini client using Google AI API")
+    return _genai_client
+
 
 def read_portfolio_statement(session_id: str = "") -> str:
     """
@@ -88,18 +113,11 @@ def extract_stock_tickers_from_portfolio(portfolio_text: str) -> str:
     try:
         print(f"Starting LLM-based stock ticker extraction from {len(portfolio_text)} characters of text")
         
-        # Create the client with proper configuration
-        # Check if we should use Vertex AI or API key
-        if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "TRUE":
-            client = genai.Client(vertexai=True)
-            print("Using Vertex AI for ticker extraction")
-        else:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                print("No GOOGLE_API_KEY found for ticker extraction")
-                return "**Error**: Google API key not configured for ticker extraction. Please set GOOGLE_API_KEY environment variable."
-            client = genai.Client(api_key=api_key)
-            print("Using Google AI API for ticker extraction")
+        # Reuse the process-wide Gemini client
+        client = _get_genai_client()
+        if client is None:
+            print("No GOOGLE_API_KEY found for ticker extraction")
+            return "**Error**: Google API key not configured for ticker extraction. Please set GOOGLE_API_KEY environment variable."
         
         # System prompt for stock ticker extraction
         system_prompt = """You are an expert financial analyst specializing in analyzing portfolio statements and identifying stock ticker symbols.
@@ -218,16 +236,15 @@ Provide only the comma-separated ticker list as specified."""
         print(f"LLM found {len(found_tickers)} tickers: {found_tickers}")
         
         # Format the result
-        result = f"**Stock Tickers Found in Portfolio:**\n\n"
-        result += f"Total stocks identified: {len(found_tickers)}\n\n"
-        result += "**Individual Stocks:**\n"
-        for i, ticker in enumerate(found_tickers, 1):
-            result += f"{i}. {ticker}\n"
+        parts = [
+            "**Stock Tickers Found in Portfolio:**\n\n",
+            f"Total stocks identified: {len(found_tickers)}\n\n",
+            "**Individual Stocks:**\n",
+        ]
+        parts.extend(f"{i}. {ticker}\n" for i, ticker in enumerate(found_tickers, 1))
+        parts.append(f"\n**Allocation Percentage:**\n{allocation_percentage}\n")
         
-        result += f"\n**Allocation Percentage:**\n"
-        result += f"{allocation_percentage}\n"
-        
-        return result
+        return "".join(parts)
         
     except Exception as e:
         print(f"Error in extract_stock_tickers_from_portfolio: {e}")
@@ -271,12 +288,7 @@ read_portfolio_statement_tool = FunctionTool(read_portfolio_statement)
 extract_stock_tickers_from_portfolio_tool = FunctionTool(extract_stock_tickers_from_portfolio)
 handle_portfolio_analysis_error_tool = FunctionTool(handle_portfolio_analysis_error)
 
-def create_agent() -> Agent:
-    """Constructs the ADK agent for stock report analysis."""
-    return Agent(
-        model="gemini-2.5-flash",
-        name="stock_report_analyser_agent",
-        instruction="""
+_AGENT_INSTRUCTION = """
             **Role:** Analyze portfolio statements and extract stock information.
 
             **Session ID Extraction:**
@@ -296,6 +308,17 @@ def create_agent() -> Agent:
             - extract_stock_tickers_from_portfolio(portfolio_text="text") - ONE string parameter
             - Use exact parameter names with quotes
             - If errors occur, use handle_portfolio_analysis_error()
-        """,
-        tools=[read_portfolio_statement_tool, extract_stock_tickers_from_portfolio_tool, handle_portfolio_analysis_error_tool],
+        """
+
+_AGENT_TOOLS = [read_portfolio_statement_tool, extract_stock_tickers_from_portfolio_tool, handle_portfolio_analysis_error_tool]
+
+
+@lru_cache(maxsize=1)
+def create_agent() -> Agent:
+    """Constructs the ADK agent for stock report analysis, building it once per process."""
+    return Agent(
+        model="gemini-2.5-flash",
+        name="stock_report_analyser_agent",
+        instruction=_AGENT_INSTRUCTION,
+        tools=_AGENT_TOOLS,
     )
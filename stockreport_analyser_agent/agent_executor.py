@@ -1,6 +1,7 @@
 import asyncio
+import base64
+import re
 import logging
-import time
 from collections.abc import AsyncGenerator
 
 from a2a.server.agent_execution import AgentExecutor
@@ -20,17 +21,36 @@ from a2a.utils.errors import ServerError
 from google.adk import Runner
 from google.adk.events import Event
 from google.genai import types
+from executor_support import (
+    SESSION_NOT_FOUND_MESSAGE,
+    SessionMemo,
+    heartbeat,
+    retry_wait_seconds,
+)
+
+# Gemini and network failures worth another attempt. Unlike the stock analyser, this agent has no
+# MCP server, so MCP and runtime errors are not treated as transient here
+_RETRYABLE_ERROR_RE = re.compile(
+    r"rate limit|quota exceeded|too many requests|429|resource_exhausted|service unavailable|internal server error|timeout|connection error|network error",
+    re.IGNORECASE,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+# Reading a large statement PDF and the ticker extraction call can leave the task quiet for a while
+_HEARTBEAT_INTERVAL_SECONDS = 15
+
+
 class StockReportAnalyserAgentExecutor(AgentExecutor):
     """An AgentExecutor that runs Stock Report Analyser's ADK-based Agent."""
 
     def __init__(self, runner: Runner):
         self.runner = runner
-        self._running_sessions = {}
+        # Follow-up messages on a statement's context reuse the session resolved for the first one
+        # instead of another get_session call
+        self._running_sessions = SessionMemo()
 
     def _run_agent(
         self, session_id, new_message: types.Content
@@ -59,7 +79,9 @@ class StockReportAnalyserAgentExecutor(AgentExecutor):
             try:
                 logger.info(f"Attempt {attempt + 1}/{max_retries + 1} for session {session_id}")
                 
+                event_count = 0
                 async for event in self._run_agent(session_id, new_message):
+                    event_count += 1
                     yield event
                 
                 # If we reach here, the execution was successful
@@ -68,20 +90,33 @@ class StockReportAnalyserAgentExecutor(AgentExecutor):
                 
             except Exception as e:
                 last_exception = e
-                error_msg = str(e).lower()
                 
-                # Check if this is a retryable error
-                is_retryable = any(keyword in error_msg for keyword in [
-                    'rate limit', 'quota exceeded', 'too many requests', 
-                    'service unavailable', 'internal server error', 'timeout',
-                    'connection error', 'network error'
-                ])
+                # Check if this is a retryable error (one case-insensitive scan of the message)
+                error_msg = str(e)
+                is_retryable = _RETRYABLE_ERROR_RE.search(error_msg) is not None
+
+                if SESSION_NOT_FOUND_MESSAGE in error_msg:
+                    # Drop the stale memo entry and recreate the session before trying again
+                    self._running_sessions.discard(session_id)
+                    if attempt < max_retries and not event_count:
+                        logger.warning(f"Session {session_id} was not found by the runner; recreating it")
+                        await self._upsert_session(session_id)
+                        continue
                 
+                # Replaying after events were yielded would re-send them to the host and re-run the statement
+                # read and ticker extraction tools, so only failures before the first event are retried
+                if event_count:
+                    logger.error(
+                        f"Attempt {attempt + 1} failed for session {session_id} after {event_count} events; "
+                        f"not retrying to avoid replaying completed steps: {e}"
+                    )
+                    raise last_exception
+
                 if attempt < max_retries and is_retryable:
-                    wait_time = (2 ** attempt) * 1  # Exponential backoff: 1s, 2s, 4s
+                    wait_time = retry_wait_seconds(attempt, error_msg)
                     logger.warning(
                         f"Attempt {attempt + 1} failed for session {session_id} with retryable error: {e}. "
-                        f"Retrying in {wait_time} seconds..."
+                        f"Retrying in {wait_time:.1f} seconds..."
                     )
                     await asyncio.sleep(wait_time)
                 else:
@@ -105,27 +140,30 @@ class StockReportAnalyserAgentExecutor(AgentExecutor):
         session_obj = await self._upsert_session(session_id)
         session_id = session_obj.id
 
+        # Status pings keep upstream callers from timing out while the model is thinking between events
+        heartbeat_task = asyncio.create_task(heartbeat(task_updater, _HEARTBEAT_INTERVAL_SECONDS))
         try:
             async for event in self._run_agent_with_retry(session_id, new_message):
+                # Resolved once per event; content is None for some events
+                content_parts = getattr(event.content, "parts", None) or []
                 if event.is_final_response():
-                    parts = convert_genai_parts_to_a2a(
-                        event.content.parts if event.content and event.content.parts else []
-                    )
+                    parts = convert_genai_parts_to_a2a(content_parts)
                     logger.debug("Yielding final response: %s", parts)
-                    await task_updater.add_artifact(parts)
+                    await task_updater.add_artifact(
+                        parts, append=False, last_chunk=True
+                    )
                     await task_updater.complete()
                     break
                 if not event.get_function_calls():
+                    update_parts = convert_genai_parts_to_a2a(content_parts)
+                    # Function responses and other payload-free events have nothing to report
+                    if not update_parts:
+                        logger.debug("Skipping event with no content")
+                        continue
                     logger.debug("Yielding update response")
                     await task_updater.update_status(
                         TaskState.working,
-                        message=task_updater.new_agent_message(
-                            convert_genai_parts_to_a2a(
-                                event.content.parts
-                                if event.content and event.content.parts
-                                else []
-                            ),
-                        ),
+                        message=task_updater.new_agent_message(update_parts),
                     )
                 else:
                     logger.debug("Skipping event")
@@ -143,6 +181,9 @@ class StockReportAnalyserAgentExecutor(AgentExecutor):
             except Exception as cleanup_error:
                 logger.warning(f"Error during cleanup after failure: {cleanup_error}")
                 # Don't re-raise cleanup errors as they're not critical
+        finally:
+            heartbeat_task.cancel()
+            await asyncio.gather(heartbeat_task, return_exceptions=True)
 
     async def execute(
         self,
@@ -186,6 +227,10 @@ class StockReportAnalyserAgentExecutor(AgentExecutor):
         raise ServerError(error=UnsupportedOperationError())
 
     async def _upsert_session(self, session_id: str):
+        session = self._running_sessions.get(session_id)
+        if session is not None:
+            return session
+
         session = await self.runner.session_service.get_session(
             app_name=self.runner.app_name, user_id="stock_report_analyser_agent", session_id=session_id
         )
@@ -197,6 +242,8 @@ class StockReportAnalyserAgentExecutor(AgentExecutor):
             )
         if session is None:
             raise RuntimeError(f"Failed to get or create session: {session_id}")
+
+        self._running_sessions.put(session_id, session)
         return session
 
 
@@ -205,90 +252,124 @@ def convert_a2a_parts_to_genai(parts: list[Part]) -> list[types.Part]:
     return [convert_a2a_part_to_genai(part) for part in parts]
 
 
+def _text_part_to_genai(root: TextPart) -> types.Part:
+    return types.Part(text=root.text)
+
+
+def _file_with_uri_to_genai(file: FileWithUri) -> types.Part:
+    # Only pass supported parameters - exclude display_name and other unsupported fields
+    return types.Part(
+        file_data=types.FileData(
+            file_uri=file.uri, 
+            mime_type=file.mimeType
+            # Note: display_name is intentionally excluded as it's not supported by Gemini API
+        )
+    )
+
+
+def _file_with_bytes_to_genai(file: FileWithBytes) -> types.Part:
+    # Handle file bytes data properly - decode if it's already bytes, encode if it's string
+    file_data = file.bytes
+    if isinstance(file_data, bytes):
+        # Already bytes: pass through without a codec round-trip
+        pass
+    elif isinstance(file_data, str):
+        # If it's a string, encode it to bytes
+        file_data = file_data.encode("utf-8")
+    else:
+        # For other types, try to convert to string first then encode
+        file_data = str(file_data).encode("utf-8")
+    
+    # Only pass supported parameters - exclude display_name and other unsupported fields
+    return types.Part(
+        inline_data=types.Blob(
+            data=file_data,
+            mime_type=file.mimeType or "application/octet-stream",
+            # Note: display_name is intentionally excluded as it's not supported by Gemini API
+        )
+    )
+
+
+# Uploaded statements arrive as FileWithBytes; links to stored files as FileWithUri
+_A2A_FILE_TO_GENAI = {
+    FileWithUri: _file_with_uri_to_genai,
+    FileWithBytes: _file_with_bytes_to_genai,
+}
+
+
+def _file_part_to_genai(root: FilePart) -> types.Part:
+    converter = _A2A_FILE_TO_GENAI.get(type(root.file))
+    if converter is None:
+        raise ValueError(f"Unsupported file type: {type(root.file)}")
+    return converter(root.file)
+
+
+# Converter for each A2A part type, looked up by exact type of part.root
+_A2A_PART_TO_GENAI = {
+    TextPart: _text_part_to_genai,
+    FilePart: _file_part_to_genai,
+}
+
+
 def convert_a2a_part_to_genai(part: Part) -> types.Part:
     """Convert a single A2A Part type into a Google Gen AI Part type."""
     root = part.root
-    if isinstance(root, TextPart):
-        return types.Part(text=root.text)
-    if isinstance(root, FilePart):
-        if isinstance(root.file, FileWithUri):
-            # Only pass supported parameters - exclude display_name and other unsupported fields
-            return types.Part(
-                file_data=types.FileData(
-                    file_uri=root.file.uri, 
-                    mime_type=root.file.mimeType
-                    # Note: display_name is intentionally excluded as it's not supported by Gemini API
-                )
-            )
-        if isinstance(root.file, FileWithBytes):
-            # Handle file bytes data properly - decode if it's already bytes, encode if it's string
-            file_data = root.file.bytes
-            if isinstance(file_data, str):
-                # If it's a string, encode it to bytes
-                file_data = file_data.encode("utf-8")
-            elif isinstance(file_data, bytes):
-                # If it's already bytes, use it as is
-                pass
-            else:
-                # For other types, try to convert to string first then encode
-                file_data = str(file_data).encode("utf-8")
-            
-            # Only pass supported parameters - exclude display_name and other unsupported fields
-            return types.Part(
-                inline_data=types.Blob(
-                    data=file_data,
-                    mime_type=root.file.mimeType or "application/octet-stream",
-                    # Note: display_name is intentionally excluded as it's not supported by Gemini API
-                )
-            )
-        raise ValueError(f"Unsupported file type: {type(root.file)}")
-    raise ValueError(f"Unsupported part type: {type(part)}")
+    converter = _A2A_PART_TO_GENAI.get(type(root))
+    if converter is None:
+        raise ValueError(f"Unsupported part type: {type(part)}")
+    return converter(root)
 
 
 def convert_genai_parts_to_a2a(parts: list[types.Part]) -> list[Part]:
     """Convert a list of Google Gen AI Part types into a list of A2A Part types."""
-    return [
-        convert_genai_part_to_a2a(part)
-        for part in parts
-        if (part.text or part.file_data or part.inline_data)
-    ]
+    converted = (_convert_genai_part_to_a2a_or_none(part) for part in parts)
+    return [part for part in converted if part is not None]
 
 
 def convert_genai_part_to_a2a(part: types.Part) -> Part:
     """Convert a single Google Gen AI Part type into an A2A Part type."""
-    if part.text:
-        return Part(root=TextPart(text=part.text))
-    if part.file_data:
-        if not part.file_data.file_uri:
+    converted = _convert_genai_part_to_a2a_or_none(part)
+    if converted is None:
+        raise ValueError(f"Unsupported part type: {part}")
+    return converted
+
+
+def _convert_genai_part_to_a2a_or_none(part: types.Part) -> Part | None:
+    """Convert a Gen AI Part, or return None for parts with no text or file payload (e.g. function calls)."""
+    # text, file_data and inline_data are each read once here rather than again in a separate filter
+    text, file_data, inline_data_part = part.text, part.file_data, part.inline_data
+    if text:
+        return Part(root=TextPart(text=text))
+    if file_data:
+        if not file_data.file_uri:
             raise ValueError("File URI is missing")
         return Part(
             root=FilePart(
                 file=FileWithUri(
-                    uri=part.file_data.file_uri,
-                    mimeType=part.file_data.mime_type,
+                    uri=file_data.file_uri,
+                    mimeType=file_data.mime_type,
                 )
             )
         )
-    if part.inline_data:
-        if not part.inline_data.data:
+    if inline_data_part:
+        if not inline_data_part.data:
             raise ValueError("Inline data is missing")
         
         # Handle inline data properly - decode to string if it's bytes
-        inline_data = part.inline_data.data
+        inline_data = inline_data_part.data
         if isinstance(inline_data, bytes):
             try:
                 inline_data = inline_data.decode("utf-8")
             except UnicodeDecodeError:
                 # If it's not valid UTF-8, convert to base64 string
-                import base64
                 inline_data = base64.b64encode(inline_data).decode("utf-8")
         
         return Part(
             root=FilePart(
                 file=FileWithBytes(
                     bytes=inline_data,
-                    mimeType=part.inline_data.mime_type,
+                    mimeType=inline_data_part.mime_type,
                 )
             )
         )
-    raise ValueError(f"Unsupported part type: {part}")
+    return None
@@ -0,0 +1 @@
+../stockanalyser_agent/executor_support.py
\ No newline at end of file